@@ -0,0 +1,189 @@
+"""
+Adaptive admission control: per-class concurrency limits that shed load early
+
+Requests are classed as auth, read or write, and each class admits at most
+its current limit concurrently. Further requests get an immediate 503 with
+Retry-After instead of queueing, so one saturated class (e.g. bcrypt-bound
+logins) cannot slow the others down. Each limit starts at its configured
+maximum. It backs off multiplicatively when a busy class's requests run well
+above their route's usual latency, and grows back additively on every
+completion that doesn't, quickly once the class is no longer saturated.
+"""
+import os
+import time
+from typing import Callable
+
+from starlette.responses import JSONResponse
+
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_LIMIT, ADMISSION_REJECTED
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+# Maximum concurrent requests per class, per worker process
+ADMISSION_AUTH_LIMIT = int(os.getenv("ADMISSION_AUTH_LIMIT", "32"))
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", "200"))
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", "64"))
+# Latency above the route's baseline * tolerance while busy counts as overload
+ADMISSION_LATENCY_TOLERANCE = float(os.getenv("ADMISSION_LATENCY_TOLERANCE", "2.0"))
+# Seconds clients are told to wait after a 503
+ADMISSION_RETRY_AFTER = os.getenv("ADMISSION_RETRY_AFTER", "1")
+
+# Never shrink below this, so a class always makes progress
+_MIN_LIMIT = 2
+_BACKOFF = 0.9
+# Absolute headroom so jitter on sub-millisecond requests isn't read as overload
+_LATENCY_SLACK_SECONDS = 0.005
+# Weight of each new sample in a route's smoothed baseline latency
+_BASELINE_ALPHA = 0.05
+# Samples a route needs before its latency can trigger a backoff
+_WARMUP_SAMPLES = 20
+
+# Not limited: health checks and scrapes must answer under load, and long-lived
+# streams would hold a slot for minutes and skew the latency samples
+EXEMPT_PATHS = frozenset({"/health", "/metrics", "/inventory/events", "/products/export", "/inventory/export"})
+_READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class RouteLatency:
+    """Smoothed latency of one route template, the yardstick for its samples"""
+
+    __slots__ = ("baseline", "samples")
+
+    def __init__(self, latency: float):
+        self.baseline = latency
+        self.samples = 0
+
+    def threshold(self) -> float:
+        return self.baseline * ADMISSION_LATENCY_TOLERANCE + _LATENCY_SLACK_SECONDS
+
+    def update(self, latency: float):
+        self.baseline += _BASELINE_ALPHA * (latency - self.baseline)
+        self.samples += 1
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one route class, driven by request latency
+
+    Each sample is compared with the baseline of its own route, so a class
+    mixing trivial and heavy endpoints isn't judged by its fastest one.
+    """
+
+    def __init__(self, name: str, max_limit: int, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Admissions made while busy; a request that sees this advance was competing
+        self.busy_admissions = 0
+        self.routes: dict[str, RouteLatency] = {}
+        self._clock = clock
+        self._last_backoff = None
+        ADMISSION_LIMIT.labels(name).set(max_limit)
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            ADMISSION_REJECTED.labels(self.name).inc()
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        if self.busy():
+            self.busy_admissions += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).inc()
+        return True
+
+    def busy(self) -> bool:
+        """Whether requests are competing for the limit"""
+        return self.in_flight >= self.limit / 2
+
+    def release(self, latency: float, route: str, busy_admissions: int):
+        """Record a finished request; `busy_admissions` is the counter's value before it was admitted"""
+        # Load during the request shows in its latency even if it has drained
+        # since; counting it as idle would let that latency into the baseline
+        busy = self.busy() or self.busy_admissions > busy_admissions
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.labels(self.name).dec()
+        self._observe(latency, route, busy)
+
+    def _observe(self, latency: float, route: str, busy: bool):
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteLatency(latency)
+        overloaded = busy and stats.samples >= _WARMUP_SAMPLES and latency > stats.threshold()
+        if overloaded:
+            # Back off at most once per threshold interval: requests admitted
+            # before the last backoff finish slow too and must not compound it
+            now = self._clock()
+            if self._last_backoff is None or now - self._last_backoff >= stats.threshold():
+                self.limit = max(_MIN_LIMIT, self.limit * _BACKOFF)
+                self._last_backoff = now
+        else:
+            # Overloaded samples stay out of the baseline, so sustained overload
+            # can't redefine itself as normal
+            stats.update(latency)
+            # About +1 per `limit` completions within the route's usual latency
+            # while busy; quicker while the class isn't even using half of it
+            self.limit = min(self.max_limit, self.limit + (1 / self.limit if busy else 1))
+        ADMISSION_LIMIT.labels(self.name).set(self.limit)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "baseline_ms": {route: round(stats.baseline * 1000, 3) for route, stats in self.routes.items()},
+        }
+
+class AdmissionController:
+    def __init__(self):
+        self.classes = {
+            "auth": AdaptiveLimit("auth", ADMISSION_AUTH_LIMIT),
+            "read": AdaptiveLimit("read", ADMISSION_READ_LIMIT),
+            "write": AdaptiveLimit("write", ADMISSION_WRITE_LIMIT),
+        }
+
+    def classify(self, method: str, path: str):
+        """Route class of a request, or None when it is exempt"""
+        if path in EXEMPT_PATHS:
+            return None
+        if path.startswith("/auth/"):
+            return self.classes["auth"]
+        return self.classes["read" if method in _READ_METHODS else "write"]
+
+    def stats(self) -> dict:
+        return {name: limit.stats() for name, limit in self.classes.items()}
+
+admission_controller = AdmissionController()
+
+class AdmissionMiddleware:
+    """Rejects requests with 503 + Retry-After while their class is at its limit"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = admission_controller.classify(scope["method"], scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+        busy_admissions = limit.busy_admissions
+        if not limit.try_acquire():
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is busy, please retry shortly"},
+                headers={"Retry-After": ADMISSION_RETRY_AFTER},
+            )
+            return await response(scope, receive, send)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Routing has filled in the matched template by now
+            route = scope.get("route")
+            limit.release(
+                time.perf_counter() - started, route.path if route is not None else "unmatched", busy_admissions
+            )
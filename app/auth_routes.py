@@ -2,7 +2,8 @@
 Authentication routes for user registration, login, and token management
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 from . import schemas, models
@@ -11,9 +12,10 @@ from .auth_utils import (
     authenticate_user, 
     create_tokens_for_user, 
     store_refresh_token,
+    rotate_refresh_token,
     validate_refresh_token,
     invalidate_refresh_token,
-    get_password_hash,
+    get_password_hash_async,
     validate_password_strength,
     verify_token
 )
@@ -21,7 +23,7 @@ from .auth_utils import (
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 @router.post("/register", response_model=schemas.User)
-async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Register a new user
     """
@@ -34,7 +36,7 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
         )
     
     # Check if user already exists
-    existing_user = db.query(models.User).filter(models.User.email == user_data.email).first()
+    existing_user = await db.scalar(select(models.User).filter(models.User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -43,30 +45,30 @@ async def register(user_data: schemas.UserCreate, db: Session = Depends(get_db))
     
     # Create new user
     try:
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = await get_password_hash_async(user_data.password)
         db_user = models.User(
             email=user_data.email,
             hashed_password=hashed_password,
             role=user_data.role
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         return db_user
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="User with this email already exists"
         )
 
 @router.post("/login", response_model=schemas.Token)
-async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     """
     User login - returns JWT tokens
     """
     # Authenticate user
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    user = await authenticate_user(db, user_credentials.email, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,14 +86,14 @@ async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_d
     tokens = create_tokens_for_user(user)
     
     # Store refresh token in database
-    store_refresh_token(db, user.id, tokens["refresh_token"])
+    await store_refresh_token(db, user.id, tokens["refresh_token"])
     
     return tokens
 
 @router.post("/refresh", response_model=schemas.Token)
 async def refresh_token(
     refresh_data: schemas.RefreshTokenRequest, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Refresh access token using refresh token
@@ -106,7 +108,7 @@ async def refresh_token(
         )
     
     # Validate refresh token in database
-    user = validate_refresh_token(db, refresh_data.refresh_token)
+    user = await validate_refresh_token(db, refresh_data.refresh_token)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -124,20 +126,25 @@ async def refresh_token(
     tokens = create_tokens_for_user(user)
     
     # Store new refresh token and invalidate old one
-    invalidate_refresh_token(db, refresh_data.refresh_token)
-    store_refresh_token(db, user.id, tokens["refresh_token"])
+    if not await rotate_refresh_token(db, refresh_data.refresh_token, user.id, tokens["refresh_token"]):
+        # Another request used this token first
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     return tokens
 
 @router.post("/logout")
 async def logout(
     refresh_data: schemas.RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Logout user by invalidating refresh token
     """
-    success = invalidate_refresh_token(db, refresh_data.refresh_token)
+    success = await invalidate_refresh_token(db, refresh_data.refresh_token)
     if success:
         return {"message": "Successfully logged out"}
     else:
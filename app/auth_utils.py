@@ -1,24 +1,40 @@
 """
 Authentication utilities for password hashing and JWT token handling
 """
+import hashlib
 import os
 from datetime import datetime, timedelta
+from uuid import uuid4
 from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
 from . import models, schemas
+from .worker_pool import BoundedWorkerPool
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so a thread pool spreads hashing across all cores
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+password_hash_pool = BoundedWorkerPool(
+    "password-hash", PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE
+)
+
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 
+# "database" loads the user row on every request; "claims" authorizes role-protected
+# routes from the verified token claims, checking only the in-memory revocation set
+AUTH_MODE = os.getenv("AUTH_MODE", "database")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -27,15 +43,25 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool, keeping the event loop free"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool, keeping the event loop free"""
+    return await password_hash_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    # iat lets claims-mode auth tell tokens issued before a role change from newer ones
+    to_encode.update({"exp": expire, "iat": now, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -43,7 +69,8 @@ def create_refresh_token(data: dict) -> str:
     """Create JWT refresh token"""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    # jti keeps two tokens issued to a user within the same second distinct
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -57,21 +84,22 @@ def verify_token(token: str, token_type: str = "access") -> Optional[schemas.Tok
         email: str = payload.get("sub")
         user_id: int = payload.get("user_id")
         role: str = payload.get("role")
+        issued_at: int = payload.get("iat")
         
         if email is None:
             return None
         
-        token_data = schemas.TokenData(email=email, user_id=user_id, role=role)
+        token_data = schemas.TokenData(email=email, user_id=user_id, role=role, issued_at=issued_at)
         return token_data
     except JWTError:
         return None
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
     """Authenticate a user by email and password"""
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await db.scalar(select(models.User).filter(models.User.email == email))
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
@@ -92,51 +120,88 @@ def create_tokens_for_user(user: models.User) -> dict:
         "token_type": "bearer"
     }
 
-def store_refresh_token(db: Session, user_id: int, refresh_token: str) -> models.RefreshToken:
-    """Store refresh token in database"""
+def hash_refresh_token(refresh_token: str) -> str:
+    """Digest stored and looked up in place of the refresh token itself"""
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+async def _add_refresh_token(db: AsyncSession, user_id: int, refresh_token: str) -> models.RefreshToken:
     # Invalidate existing refresh tokens for this user
-    db.query(models.RefreshToken).filter(
-        models.RefreshToken.user_id == user_id,
-        models.RefreshToken.is_active == True
-    ).update({"is_active": False})
+    await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.user_id == user_id,
+            models.RefreshToken.is_active == True
+        )
+        .values(is_active=False)
+    )
     
     # Create new refresh token record
     expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     db_refresh_token = models.RefreshToken(
-        token=refresh_token,
+        token_hash=hash_refresh_token(refresh_token),
         user_id=user_id,
         expires_at=expires_at
     )
     db.add(db_refresh_token)
-    db.commit()
-    db.refresh(db_refresh_token)
     return db_refresh_token
 
-def validate_refresh_token(db: Session, refresh_token: str) -> Optional[models.User]:
+async def store_refresh_token(db: AsyncSession, user_id: int, refresh_token: str) -> models.RefreshToken:
+    """Store refresh token in database"""
+    db_refresh_token = await _add_refresh_token(db, user_id, refresh_token)
+    await db.commit()
+    return db_refresh_token
+
+async def rotate_refresh_token(db: AsyncSession, refresh_token: str, user_id: int, new_refresh_token: str) -> bool:
+    """Replace a refresh token with a new one in a single transaction
+
+    Returns False, changing nothing, when the old token was already used or
+    invalidated, so a token replayed concurrently is only accepted once.
+    """
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == hash_refresh_token(refresh_token),
+            models.RefreshToken.is_active == True
+        )
+        .values(is_active=False)
+    )
+    if result.rowcount != 1:
+        await db.rollback()
+        return False
+    await _add_refresh_token(db, user_id, new_refresh_token)
+    await db.commit()
+    return True
+
+async def validate_refresh_token(db: AsyncSession, refresh_token: str) -> Optional[models.User]:
     """Validate refresh token and return associated user"""
-    db_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == refresh_token,
-        models.RefreshToken.is_active == True,
-        models.RefreshToken.expires_at > datetime.utcnow()
-    ).first()
+    # Load the user eagerly: lazy relationship loads are not allowed under asyncio
+    db_token = await db.scalar(
+        select(models.RefreshToken)
+        .options(joinedload(models.RefreshToken.user))
+        .filter(
+            models.RefreshToken.token_hash == hash_refresh_token(refresh_token),
+            models.RefreshToken.is_active == True,
+            models.RefreshToken.expires_at > datetime.utcnow()
+        )
+    )
     
     if not db_token:
         return None
     
     return db_token.user
 
-def invalidate_refresh_token(db: Session, refresh_token: str) -> bool:
+async def invalidate_refresh_token(db: AsyncSession, refresh_token: str) -> bool:
     """Invalidate a refresh token"""
-    db_token = db.query(models.RefreshToken).filter(
-        models.RefreshToken.token == refresh_token,
-        models.RefreshToken.is_active == True
-    ).first()
-    
-    if db_token:
-        db_token.is_active = False
-        db.commit()
-        return True
-    return False
+    result = await db.execute(
+        update(models.RefreshToken)
+        .where(
+            models.RefreshToken.token_hash == hash_refresh_token(refresh_token),
+            models.RefreshToken.is_active == True
+        )
+        .values(is_active=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
 
 def validate_password_strength(password: str) -> tuple[bool, str]:
     """Validate password strength"""
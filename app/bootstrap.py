@@ -0,0 +1,39 @@
+"""
+Create the schema and seed data once per deployment
+
+    python -m app.bootstrap            # tables + default users and catalog
+    python -m app.bootstrap --no-seed  # tables only
+
+Run it as a release step and start the API with BOOTSTRAP_ON_STARTUP=false,
+so workers and new pods don't repeat the work before serving.
+"""
+import argparse
+import asyncio
+import time
+
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from .database import Base, SessionLocal, engine
+
+async def bootstrap(seed: bool = True):
+    """Create missing tables and, on an empty database, the seed data"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    if seed:
+        # Only needed here; keeps the generator out of the API's import path
+        from .fake_data import create_initial_data
+
+        async with SessionLocal() as db:
+            await create_initial_data(db)
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Create the schema and seed data")
+    parser.add_argument("--no-seed", action="store_true", help="Create tables only")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    await bootstrap(seed=not args.no_seed)
+    await engine.dispose()
+    print(f"Bootstrapped {engine.url.render_as_string(hide_password=True)} in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,82 +1,436 @@
 """
 CRUD operations for database models
 """
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional, Sequence
+from sqlalchemy import bindparam, func, insert, literal_column, select, text, tuple_, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, to_tsquery
+from sqlalchemy.types import Integer
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models, schemas
+from .cache import user_cache
+from .events import inventory_event, inventory_events
+from .facets import count_cells, facet_counts, product_facets
+from .pagination import paginate_after
+from .response_cache import response_cache
+from .revocation import revocation_set
+from .search import prefix_tsquery, product_search_text, search_terms
+from .versions import bump_versions
 
 # Product operations
-def get_product(db: Session, product_id: int):
-    return db.query(models.Product).filter(models.Product.id == product_id).first()
+async def get_product(db: AsyncSession, product_id: int):
+    return await db.scalar(select(models.Product).filter(models.Product.id == product_id))
 
-def get_products(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Product).offset(skip).limit(limit).all()
+def _product_filters(
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_active: Optional[bool] = None
+) -> list:
+    conditions = []
+    if category is not None:
+        conditions.append(models.Product.category == category)
+    if brand is not None:
+        conditions.append(models.Product.brand == brand)
+    if min_price is not None:
+        conditions.append(models.Product.price >= min_price)
+    if max_price is not None:
+        conditions.append(models.Product.price <= max_price)
+    if is_active is not None:
+        conditions.append(models.Product.is_active == is_active)
+    return conditions
 
-def create_product(db: Session, product: schemas.ProductCreate):
+async def get_products(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[list] = None,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_active: Optional[bool] = None
+):
+    query = select(models.Product).where(
+        *_product_filters(category, brand, min_price, max_price, is_active)
+    )
+    query = paginate_after(query, [models.Product.id], after)
+    if after is None:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
+
+async def get_product_facets(
+    db: AsyncSession,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_active: Optional[bool] = None
+) -> dict:
+    """Category and brand counts for the given filters"""
+    if min_price is None and max_price is None:
+        cells = await product_facets.get_cells(db)
+    else:
+        # Price ranges are arbitrary, so they can't be served from the cached cells
+        cells = await count_cells(db, *_product_filters(min_price=min_price, max_price=max_price))
+    return facet_counts(cells, category=category, brand=brand, is_active=is_active)
+
+async def search_products(db: AsyncSession, query: str, limit: int = 20):
+    """Rank products whose name, brand or description match every term of the query"""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if db.bind.dialect.name == "postgresql":
+        # Stored column behind ix_products_search_vector; see models.Product
+        vector = literal_column("products.search_vector", TSVECTOR)
+        tsquery = to_tsquery(literal_column("'simple'"), prefix_tsquery(terms))
+        statement = (
+            select(models.Product)
+            .where(vector.op("@@")(tsquery))
+            .order_by(func.ts_rank(vector, tsquery).desc(), models.Product.id)
+        )
+    else:
+        # Unindexed fallback for SQLite development databases
+        statement = select(models.Product).order_by(models.Product.id)
+        for term in terms:
+            statement = statement.where(models.Product.search_text.contains(term, autoescape=True))
+    return (await db.scalars(statement.limit(limit))).all()
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
     db_product = models.Product(**product.dict())
     db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    await bump_versions(db, "products")
+    await db.commit()
+    await response_cache.invalidate("products")
+    await db.refresh(db_product)
+    product_facets.record_products([(db_product.category, db_product.brand, db_product.is_active)])
     return db_product
 
+# Columns written by bulk product inserts; COPY skips column defaults, so they are explicit
+BULK_PRODUCT_COLUMNS = (
+    "name", "description", "price", "category", "brand", "image_url", "is_active", "search_text"
+)
+
+async def copy_rows(db: AsyncSession, model, columns: Sequence[str], records: list[tuple]):
+    """Insert value tuples for `columns` without committing; uses COPY on asyncpg"""
+    if db.bind.dialect.driver == "asyncpg":
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            model.__tablename__, records=records, columns=columns
+        )
+    else:
+        await db.execute(insert(model.__table__), [dict(zip(columns, record)) for record in records])
+
+def _bulk_product_row(product: dict) -> dict:
+    return {
+        **product,
+        "is_active": product.get("is_active", True),
+        "search_text": product_search_text(
+            product.get("name"), product.get("brand"), product.get("description")
+        ),
+    }
+
+async def _insert_product_rows(db: AsyncSession, rows: list[dict]):
+    """COPY/insert rows and bump the products version in one transaction; on a database error roll back and re-raise"""
+    try:
+        await copy_rows(
+            db,
+            models.Product,
+            BULK_PRODUCT_COLUMNS,
+            [tuple(row[column] for column in BULK_PRODUCT_COLUMNS) for row in rows],
+        )
+        await bump_versions(db, "products")
+        await db.commit()
+    except DBAPIError:
+        await db.rollback()
+        raise
+
+async def _products_inserted(db: AsyncSession, rows: list[dict]):
+    await response_cache.invalidate("products")
+    product_facets.record_products((row["category"], row.get("brand"), row["is_active"]) for row in rows)
+
+async def bulk_insert_products(db: AsyncSession, products: list[dict]) -> int:
+    """Insert a batch of product dicts and commit; uses COPY on asyncpg
+
+    Raises DBAPIError, with nothing inserted, when the database rejects any row.
+    """
+    rows = [_bulk_product_row(product) for product in products]
+    await _insert_product_rows(db, rows)
+    await _products_inserted(db, rows)
+    return len(rows)
+
+async def insert_products_one_by_one(db: AsyncSession, products: list[dict]) -> list[Optional[str]]:
+    """Insert and commit product dicts one at a time; returns each one's database error or None"""
+    inserted = []
+    errors = []
+    for row in (_bulk_product_row(product) for product in products):
+        try:
+            await _insert_product_rows(db, [row])
+        except DBAPIError as exc:
+            errors.append(str(exc.orig))
+        else:
+            inserted.append(row)
+            errors.append(None)
+    if inserted:
+        await _products_inserted(db, inserted)
+    return errors
+
 # Warehouse operations
-def get_warehouse(db: Session, warehouse_id: int):
-    return db.query(models.Warehouse).filter(models.Warehouse.id == warehouse_id).first()
+async def get_warehouse(db: AsyncSession, warehouse_id: int):
+    return await db.scalar(select(models.Warehouse).filter(models.Warehouse.id == warehouse_id))
 
-def get_warehouses(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Warehouse).offset(skip).limit(limit).all()
+async def get_warehouses(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[list] = None):
+    query = paginate_after(select(models.Warehouse), [models.Warehouse.id], after)
+    if after is None:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
 
-def create_warehouse(db: Session, warehouse: schemas.WarehouseCreate):
+async def create_warehouse(db: AsyncSession, warehouse: schemas.WarehouseCreate):
     db_warehouse = models.Warehouse(**warehouse.dict())
     db.add(db_warehouse)
-    db.commit()
-    db.refresh(db_warehouse)
+    await bump_versions(db, "warehouses")
+    await db.commit()
+    await response_cache.invalidate("warehouses")
+    await db.refresh(db_warehouse)
     return db_warehouse
 
 # Inventory operations
-def get_inventory_item(db: Session, product_id: int, warehouse_id: int):
-    return db.query(models.Inventory).filter(
+async def get_inventory_item(db: AsyncSession, product_id: int, warehouse_id: int):
+    return await db.scalar(select(models.Inventory).filter(
         models.Inventory.product_id == product_id,
         models.Inventory.warehouse_id == warehouse_id
-    ).first()
+    ))
 
-def get_inventory_items(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Inventory).offset(skip).limit(limit).all()
+async def _inventory_rows(db: AsyncSession, query, columns: Optional[Sequence]):
+    # With columns, return plain row tuples and skip building ORM instances
+    if columns is not None:
+        return (await db.execute(query.with_only_columns(*columns))).all()
+    return (await db.scalars(query)).all()
+
+async def get_inventory_items(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[list] = None,
+    columns: Optional[Sequence] = None
+):
+    query = paginate_after(select(models.Inventory), [models.Inventory.id], after)
+    if after is None:
+        query = query.offset(skip)
+    return await _inventory_rows(db, query.limit(limit), columns)
+
+async def get_low_stock_items(
+    db: AsyncSession,
+    warehouse_id: Optional[int] = None,
+    category: Optional[str] = None,
+    limit: int = 100,
+    after: Optional[list] = None,
+    columns: Optional[Sequence] = None
+):
+    # The predicate must match ix_inventory_low_stock for the planner to use it
+    query = select(models.Inventory).where(
+        models.Inventory.quantity < models.Inventory.minimum_stock_level
+    )
+    if warehouse_id is not None:
+        query = query.where(models.Inventory.warehouse_id == warehouse_id)
+    if category is not None:
+        query = query.join(models.Product).where(models.Product.category == category)
+    query = paginate_after(query, [models.Inventory.id], after)
+    return await _inventory_rows(db, query.limit(limit), columns)
 
-def create_inventory_item(db: Session, inventory: schemas.InventoryCreate):
+async def create_inventory_item(db: AsyncSession, inventory: schemas.InventoryCreate):
     db_inventory = models.Inventory(**inventory.dict())
     db.add(db_inventory)
-    db.commit()
-    db.refresh(db_inventory)
+    await db.commit()
+    await db.refresh(db_inventory)
+    inventory_events.publish(inventory_event(
+        "inventory.created", db_inventory.product_id, db_inventory.warehouse_id, db_inventory.quantity
+    ))
     return db_inventory
 
-def update_inventory_quantity(db: Session, product_id: int, warehouse_id: int, quantity: int):
-    db_inventory = get_inventory_item(db, product_id=product_id, warehouse_id=warehouse_id)
+async def update_inventory_quantity(db: AsyncSession, product_id: int, warehouse_id: int, quantity: int):
+    db_inventory = await get_inventory_item(db, product_id=product_id, warehouse_id=warehouse_id)
     if db_inventory:
         db_inventory.quantity = quantity
-        db.commit()
-        db.refresh(db_inventory)
+        db_inventory.version = models.Inventory.version + 1
+        await db.commit()
+        await db.refresh(db_inventory)
+        inventory_events.publish(inventory_event(
+            "inventory.updated", product_id, warehouse_id, db_inventory.quantity
+        ))
     return db_inventory
 
+async def adjust_inventory_quantity(db: AsyncSession, product_id: int, warehouse_id: int, delta: int):
+    """Atomically add delta to a quantity; returns None if missing or it would go negative"""
+    # A single conditional UPDATE lets the database serialize concurrent adjustments,
+    # so parallel workers never lose each other's changes
+    db_inventory = await db.scalar(
+        update(models.Inventory)
+        .where(
+            models.Inventory.product_id == product_id,
+            models.Inventory.warehouse_id == warehouse_id,
+            models.Inventory.quantity + delta >= 0
+        )
+        .values(quantity=models.Inventory.quantity + delta, version=models.Inventory.version + 1)
+        .returning(models.Inventory)
+    )
+    await db.commit()
+    if db_inventory is not None:
+        inventory_events.publish(inventory_event(
+            "inventory.updated", product_id, warehouse_id, db_inventory.quantity
+        ))
+    return db_inventory
+
+# Rows per statement for bulk inventory updates
+BULK_UPDATE_CHUNK_SIZE = 5000
+
+# One set-based statement per chunk: update changed rows and report which pairs exist
+_PG_BULK_UPDATE_INVENTORY = text("""
+    WITH v AS (
+        SELECT * FROM unnest(:product_ids, :warehouse_ids, :quantities)
+            AS v(product_id, warehouse_id, quantity)
+    ),
+    updated AS (
+        UPDATE inventory AS i SET quantity = v.quantity, version = i.version + 1
+        FROM v
+        WHERE i.product_id = v.product_id
+          AND i.warehouse_id = v.warehouse_id
+          AND i.quantity <> v.quantity
+        RETURNING i.product_id, i.warehouse_id
+    )
+    SELECT v.product_id, v.warehouse_id, EXISTS (
+        SELECT 1 FROM updated u
+        WHERE u.product_id = v.product_id AND u.warehouse_id = v.warehouse_id
+    ) AS changed
+    FROM v
+    JOIN inventory i ON i.product_id = v.product_id AND i.warehouse_id = v.warehouse_id
+""").bindparams(
+    bindparam("product_ids", type_=ARRAY(Integer)),
+    bindparam("warehouse_ids", type_=ARRAY(Integer)),
+    bindparam("quantities", type_=ARRAY(Integer)),
+)
+
+async def _bulk_update_chunk_postgres(db: AsyncSession, chunk: dict) -> dict:
+    keys = list(chunk)
+    result = await db.execute(_PG_BULK_UPDATE_INVENTORY, {
+        "product_ids": [product_id for product_id, _ in keys],
+        "warehouse_ids": [warehouse_id for _, warehouse_id in keys],
+        "quantities": list(chunk.values()),
+    })
+    return {(row.product_id, row.warehouse_id): row.changed for row in result}
+
+async def _bulk_update_chunk_generic(db: AsyncSession, chunk: dict) -> dict:
+    rows = await db.execute(
+        select(models.Inventory.id, models.Inventory.product_id, models.Inventory.warehouse_id,
+               models.Inventory.quantity, models.Inventory.version)
+        .where(tuple_(models.Inventory.product_id, models.Inventory.warehouse_id).in_(list(chunk)))
+    )
+    found = {}
+    changes = []
+    for row in rows:
+        key = (row.product_id, row.warehouse_id)
+        changed = row.quantity != chunk[key]
+        found[key] = found.get(key, False) or changed
+        if changed:
+            changes.append({"id": row.id, "quantity": chunk[key], "version": row.version + 1})
+    if changes:
+        # ORM bulk UPDATE by primary key: a single executemany
+        await db.execute(update(models.Inventory), changes)
+    return found
+
+async def bulk_update_inventory_quantities(db: AsyncSession, items: list[schemas.InventoryQuantity]):
+    """Set many inventory quantities in one transaction; later duplicates win"""
+    quantities = {(item.product_id, item.warehouse_id): item.quantity for item in items}
+    keys = list(quantities)
+    update_chunk = (
+        _bulk_update_chunk_postgres if db.bind.dialect.name == "postgresql"
+        else _bulk_update_chunk_generic
+    )
+
+    changed = {}
+    for start in range(0, len(keys), BULK_UPDATE_CHUNK_SIZE):
+        chunk = {key: quantities[key] for key in keys[start:start + BULK_UPDATE_CHUNK_SIZE]}
+        changed.update(await update_chunk(db, chunk))
+    await db.commit()
+    for key, was_changed in changed.items():
+        if was_changed:
+            inventory_events.publish(inventory_event("inventory.updated", *key, quantities[key]))
+
+    statuses = {
+        key: "not_found" if key not in changed else "updated" if changed[key] else "unchanged"
+        for key in keys
+    }
+    # Counts are per distinct (product, warehouse) pair, i.e. rows actually changed
+    counts = {"updated": 0, "unchanged": 0, "not_found": 0}
+    for status in statuses.values():
+        counts[status] += 1
+    return schemas.InventoryBulkResult(**counts, results=[
+        schemas.InventoryBulkItemResult(
+            product_id=item.product_id,
+            warehouse_id=item.warehouse_id,
+            status=statuses[(item.product_id, item.warehouse_id)]
+        )
+        for item in items
+    ])
+
 # User operations
-def get_user(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.scalar(select(models.User).filter(models.User.id == user_id))
 
-def get_user_by_email(db: Session, email: str):
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str):
+    return await db.scalar(select(models.User).filter(models.User.email == email))
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[list] = None):
+    query = paginate_after(select(models.User), [models.User.id], after)
+    if after is None:
+        query = query.offset(skip)
+    return (await db.scalars(query.limit(limit))).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    from .auth_utils import get_password_hash
-    hashed_password = get_password_hash(user.password)
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    from .auth_utils import get_password_hash_async
+    hashed_password = await get_password_hash_async(user.password)
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def update_user(db: AsyncSession, user_id: int, user_update: schemas.UserUpdate):
+    db_user = await get_user(db, user_id=user_id)
+    if db_user:
+        # Both columns are NOT NULL, so an explicit null means "leave unchanged";
+        # so does a value equal to the current one
+        changes = {
+            field: value for field, value in user_update.dict(exclude_unset=True).items()
+            if value is not None and value != getattr(db_user, field)
+        }
+        for field, value in changes.items():
+            setattr(db_user, field, value)
+        if changes:
+            # Access tokens issued until now carry the old claims and must not be trusted
+            db_user.tokens_valid_after = datetime.utcnow()
+            # End the user's session so tokens carrying the old claims stop being refreshed
+            await db.execute(
+                update(models.RefreshToken)
+                .where(
+                    models.RefreshToken.user_id == user_id,
+                    models.RefreshToken.is_active == True
+                )
+                .values(is_active=False)
+            )
+        await db.commit()
+        await db.refresh(db_user)
+        # Role or active-state changes must not be served from the principal cache
+        # or trusted from token claims
+        if changes:
+            user_cache.invalidate(user_id)
+            revocation_set.add(user_id, db_user.tokens_valid_after)
+    return db_user
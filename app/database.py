@@ -1,24 +1,153 @@
 # app/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import os
+import time
+from uuid import uuid4
 
-# استخدم اسم الخدمة "db" بدلاً من "localhost" داخل Docker
-SQLALCHEMY_DATABASE_URL = "postgresql://postgres:postgres@db:5432/swedish_ecommerce"
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from .metrics import instrument_engine, observe_pool_occupancy, observe_pool_wait
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=20,
-    max_overflow=10
+# استخدم اسم الخدمة "db" بدلاً من "localhost" داخل Docker
+SQLALCHEMY_DATABASE_URL = os.getenv(
+    "DATABASE_URL", "postgresql://postgres:postgres@db:5432/swedish_ecommerce"
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Async drivers used for each backend when the URL does not name one
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url: str) -> str:
+    """Rewrite a plain database URL to use the matching async driver"""
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+ASYNC_DATABASE_URL = to_async_url(SQLALCHEMY_DATABASE_URL)
+
+# Connection pool, per worker process: keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# below the server's max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Replace connections older than this many seconds (-1 keeps them forever)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Cancel statements running longer than this; 0 disables the limit
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+# Connecting through PgBouncer in transaction pooling mode: PgBouncer does the
+# pooling and a server connection may change between transactions, so there is
+# no local pool and no prepared-statement caching
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.waits += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            observe_pool_wait(waited, timed_out)
+            observe_pool_occupancy(self.checkedout(), max(self.overflow(), 0))
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        observe_pool_occupancy(self.checkedout(), max(self.overflow(), 0))
+
+def _postgres_engine_options(poolclass) -> dict:
+    connect_args = {}
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            # Unnamed statements could collide with another client's on a shared server connection
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+        if DB_STATEMENT_TIMEOUT_MS:
+            # PgBouncer rejects server_settings in the startup packet; enforce client-side
+            connect_args["command_timeout"] = DB_STATEMENT_TIMEOUT_MS / 1000
+    else:
+        options = {
+            "poolclass": poolclass,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        }
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+    options["connect_args"] = connect_args
+    return options
+
+def create_database_engine(url: str, poolclass=TimedQueuePool):
+    """Async engine for a database URL, configured from the DB_* settings"""
+    url = to_async_url(url)
+    if url.startswith("sqlite"):
+        # SQLite (tests / local runs) picks its own pool; sizing only applies to Postgres
+        return create_async_engine(url)
+    return create_async_engine(url, **_postgres_engine_options(poolclass))
+
+engine = create_database_engine(SQLALCHEMY_DATABASE_URL)
+
+# Per-statement timings for /metrics
+instrument_engine(engine.sync_engine)
+
+def pool_stats() -> dict:
+    """Current occupancy of the connection pool, for /health and alerting"""
+    pool = engine.sync_engine.pool
+    stats = {"class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # Negative until pool_size connections have been opened
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats.update(
+            waits=pool.waits,
+            avg_wait_ms=round(pool.wait_seconds / pool.waits * 1000, 3) if pool.waits else 0.0,
+            max_wait_ms=round(pool.max_wait_seconds * 1000, 3),
+            timeouts=pool.timeouts,
+        )
+    return stats
+
+class PrimarySession(Session):
+    """Sessions on the primary; session events can target writes through this class"""
+
+# expire_on_commit=False: attributes can't be lazily reloaded under asyncio
+SessionLocal = async_sessionmaker(
+    engine, class_=AsyncSession, sync_session_class=PrimarySession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
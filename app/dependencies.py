@@ -1,13 +1,19 @@
 """
 Dependency injections for the application
 """
+import time
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from .database import get_db
-from .auth_utils import verify_token
+from .replicas import get_read_db
+from .auth_utils import AUTH_MODE, verify_token
+from .cache import user_cache
+from .revocation import revocation_set
 from . import models, schemas
 
 # Security scheme
@@ -15,10 +21,11 @@ security = HTTPBearer()
 
 # Re-export get_db for consistency
 get_db = get_db
+get_read_db = get_read_db
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> models.User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -34,7 +41,18 @@ async def get_current_user(
     if token_data is None:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    # Only active users are cached; updates evict the entry in this process, and the
+    # revocation set catches updates made by other workers, so without a fresh set
+    # the cache is bypassed
+    cached = user_cache.get(token_data.user_id) if token_data.user_id is not None else None
+    if cached is not None and revocation_set.is_fresh():
+        user, loaded_at = cached
+        if user.email == token_data.email and not revocation_set.revoked(user.id, loaded_at):
+            return user
+    
+    # Taken before the read, so a change committed meanwhile counts as newer
+    loaded_at = time.time()
+    user = await db.scalar(select(models.User).filter(models.User.email == token_data.email))
     if user is None:
         raise credentials_exception
     
@@ -44,6 +62,9 @@ async def get_current_user(
             detail="Inactive user"
         )
     
+    # Detach so the cached instance is never tied to another request's session
+    db.expunge(user)
+    user_cache.set(user.id, (user, loaded_at))
     return user
 
 async def get_current_active_user(
@@ -52,9 +73,35 @@ async def get_current_active_user(
     """Get current active user"""
     return current_user
 
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> models.User:
+    """Get the caller from verified token claims alone when AUTH_MODE is "claims"
+
+    Revoked users, malformed claims and a stale revocation set all fall back to
+    get_current_user, so the database stays the source of truth for them.
+    """
+    if AUTH_MODE == "claims" and credentials and revocation_set.is_fresh():
+        token_data = verify_token(credentials.credentials)
+        if (
+            token_data is not None
+            and token_data.user_id is not None
+            and token_data.role in models.UserRole.__members__
+            and not revocation_set.revoked(token_data.user_id, token_data.issued_at)
+        ):
+            # Transient stand-in built from the claims; never added to a session
+            return models.User(
+                id=token_data.user_id,
+                email=token_data.email,
+                role=models.UserRole(token_data.role),
+                is_active=True
+            )
+    return await get_current_user(credentials, db)
+
 def require_role(allowed_roles: list[str]):
     """Dependency factory for role-based access control"""
-    def role_checker(current_user: models.User = Depends(get_current_active_user)):
+    async def role_checker(current_user: models.User = Depends(get_current_principal)):
         if current_user.role.value not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,105 @@
+"""
+In-process pub/sub for inventory change events
+"""
+import asyncio
+import os
+from typing import Iterable, Optional
+
+# Events buffered per subscriber before it is considered too slow and dropped
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+
+# Final event sent to a subscriber that fell behind; the client should re-fetch and reconnect
+OVERFLOW_EVENT = {"type": "overflow"}
+
+class Subscription:
+    """One client's filters and bounded event buffer"""
+
+    __slots__ = ("product_ids", "warehouse_ids", "queue", "closed")
+
+    def __init__(self, product_ids: Optional[set], warehouse_ids: Optional[set], max_queue: int):
+        self.product_ids = product_ids
+        self.warehouse_ids = warehouse_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+class InventoryEventBroker:
+    """Fans inventory change events out to subscribers filtered by product/warehouse"""
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        # Subscribers indexed by product so publishing only touches interested ones
+        self._by_product: dict[int, set] = {}
+        self._any_product: set = set()
+        self._subscribers = 0
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(
+        self,
+        product_ids: Optional[Iterable[int]] = None,
+        warehouse_ids: Optional[Iterable[int]] = None
+    ) -> Subscription:
+        subscription = Subscription(
+            set(product_ids) if product_ids else None,
+            set(warehouse_ids) if warehouse_ids else None,
+            self.max_queue,
+        )
+        if subscription.product_ids is None:
+            self._any_product.add(subscription)
+        else:
+            for product_id in subscription.product_ids:
+                self._by_product.setdefault(product_id, set()).add(subscription)
+        self._subscribers += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription.closed:
+            return
+        subscription.closed = True
+        if subscription.product_ids is None:
+            self._any_product.discard(subscription)
+        else:
+            for product_id in subscription.product_ids:
+                subscribers = self._by_product.get(product_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_product[product_id]
+        self._subscribers -= 1
+
+    def publish(self, event: dict):
+        """Deliver an event without ever waiting on a subscriber"""
+        self.published += 1
+        candidates = self._any_product | self._by_product.get(event["product_id"], set())
+        for subscription in candidates:
+            if subscription.warehouse_ids is not None and event["warehouse_id"] not in subscription.warehouse_ids:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: replace its backlog with a single overflow notice
+                # and stop feeding it, so one client can't grow memory unbounded
+                self.unsubscribe(subscription)
+                subscription.queue = asyncio.Queue(maxsize=1)
+                subscription.queue.put_nowait(OVERFLOW_EVENT)
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._subscribers,
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+def inventory_event(event_type: str, product_id: int, warehouse_id: int, quantity: int) -> dict:
+    return {
+        "type": event_type,
+        "product_id": product_id,
+        "warehouse_id": warehouse_id,
+        "quantity": quantity,
+    }
+
+inventory_events = InventoryEventBroker(EVENT_QUEUE_SIZE)
@@ -0,0 +1,82 @@
+"""
+Cached product facet counts, kept up to date incrementally as products are added
+"""
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select
+
+from . import models
+
+# Reload interval; bounds drift from products created by other workers
+FACET_CACHE_TTL_SECONDS = float(os.getenv("FACET_CACHE_TTL_SECONDS", "300"))
+
+def facet_counts(
+    cells: Counter,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    is_active: Optional[bool] = None
+) -> dict:
+    """Per-category and per-brand counts from (category, brand, is_active) cells
+
+    Each facet ignores its own filter, so the storefront can show how many
+    products every alternative category or brand would return.
+    """
+    categories = Counter()
+    brands = Counter()
+    for (cell_category, cell_brand, cell_active), count in cells.items():
+        if is_active is not None and cell_active != is_active:
+            continue
+        if cell_category is not None and (brand is None or cell_brand == brand):
+            categories[cell_category] += count
+        if cell_brand is not None and (category is None or cell_category == category):
+            brands[cell_brand] += count
+    return {"categories": dict(categories), "brands": dict(brands)}
+
+async def count_cells(db, *conditions) -> Counter:
+    rows = await db.execute(
+        select(
+            models.Product.category,
+            models.Product.brand,
+            models.Product.is_active,
+            func.count(models.Product.id)
+        )
+        .where(*conditions)
+        .group_by(models.Product.category, models.Product.brand, models.Product.is_active)
+    )
+    return Counter({(category, brand, is_active): count for category, brand, is_active, count in rows})
+
+class ProductFacetCache:
+    """Product counts per (category, brand, is_active), loaded once and then incremented"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._cells: Optional[Counter] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._changed_while_loading = False
+
+    async def get_cells(self, db) -> Counter:
+        if self._cells is None or time.monotonic() - self._loaded_at > self.ttl:
+            async with self._lock:
+                if self._cells is None or time.monotonic() - self._loaded_at > self.ttl:
+                    self._changed_while_loading = False
+                    cells = await count_cells(db)
+                    self._cells = cells
+                    # Increments that raced with the query may be missing; reload next time
+                    self._loaded_at = 0.0 if self._changed_while_loading else time.monotonic()
+        return self._cells
+
+    def record_products(self, products: Iterable[tuple]):
+        """Count newly committed products given as (category, brand, is_active) tuples"""
+        self._changed_while_loading = True
+        if self._cells is not None:
+            self._cells.update(products)
+
+    def invalidate(self):
+        self._cells = None
+
+product_facets = ProductFacetCache(FACET_CACHE_TTL_SECONDS)
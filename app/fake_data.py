@@ -1,17 +1,27 @@
 """
 Generate initial fake data for Swedish e-commerce
 """
-from sqlalchemy.orm import Session
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models, crud
-from .auth_utils import get_password_hash
+from .auth_utils import get_password_hash_async
+from .facets import product_facets
+from .search import product_search_text
+from .versions import bump_versions
 
-def create_initial_data(db: Session):
+async def create_initial_data(db: AsyncSession, seed: int = 0):
     """
     Create initial fake data for the database
     """
     # Check if data already exists
-    if db.query(models.Product).count() > 0:
+    if await db.scalar(select(func.count(models.Product.id))) > 0:
         return  # Data already exists
     
     # Create initial users with secure passwords that meet validation requirements
@@ -19,19 +29,19 @@ def create_initial_data(db: Session):
     users_data = [
         {
             "email": "admin@company.se",
-            "hashed_password": get_password_hash("SecureAdmin123"),
+            "hashed_password": await get_password_hash_async("SecureAdmin123"),
             "role": models.UserRole.admin,
             "is_active": True
         },
         {
             "email": "manager@company.se", 
-            "hashed_password": get_password_hash("ManagerPass123"),
+            "hashed_password": await get_password_hash_async("ManagerPass123"),
             "role": models.UserRole.manager,
             "is_active": True
         },
         {
             "email": "viewer@company.se",
-            "hashed_password": get_password_hash("ViewerAccess123"),
+            "hashed_password": await get_password_hash_async("ViewerAccess123"),
             "role": models.UserRole.viewer,
             "is_active": True
         }
@@ -42,7 +52,7 @@ def create_initial_data(db: Session):
         user = models.User(**user_data)
         db.add(user)
     
-    db.commit()
+    await db.commit()
 
     # Create products (common Swedish e-commerce items)
     products_data = [
@@ -156,19 +166,239 @@ def create_initial_data(db: Session):
         db.add(warehouse)
         warehouses.append(warehouse)
     
-    db.commit()
+    await db.commit()
     
     # Create inventory items
-    import random
+    rng = random.Random(seed)
     for product in products:
         for warehouse in warehouses:
             inventory_data = {
                 "product_id": product.id,
                 "warehouse_id": warehouse.id,
-                "quantity": random.randint(0, 200),
+                "quantity": rng.randint(0, 200),
                 "minimum_stock_level": 10
             }
             inventory = models.Inventory(**inventory_data)
             db.add(inventory)
     
-    db.commit()
\ No newline at end of file
+    await db.commit()
+
+# Synthetic catalog vocabulary for generate_dataset
+CATEGORY_BRANDS = {
+    "Electronics": ["Apple", "Samsung", "Sony", "Ericsson", "Marshall", "Teenage Engineering"],
+    "Fashion": ["H&M", "Fjällräven", "Acne Studios", "Filippa K", "Houdini", "Björn Borg"],
+    "Food": ["Arla", "Semper", "Marabou", "Felix", "Oatly", "Skånemejerier"],
+    "Furniture": ["IKEA", "Mio", "Svenskt Tenn", "String", "Hästens"],
+    "Home": ["Orrefors", "Kosta Boda", "Rörstrand", "Gustavsberg", "Systembolaget"],
+    "Toys": ["BRIO", "Micki", "Volvo", "Plasto"],
+    "Sports": ["Haglöfs", "Peak Performance", "Craft", "Klättermusen"],
+    "Beauty": ["Byredo", "Lumene", "L:a Bruket", "Maria Åkerberg"],
+}
+# Median price in SEK per category; prices are drawn log-normally around it
+CATEGORY_PRICES = {
+    "Electronics": 2500, "Fashion": 450, "Food": 40, "Furniture": 1800,
+    "Home": 300, "Toys": 250, "Sports": 900, "Beauty": 350,
+}
+ADJECTIVES = [
+    "Klassisk", "Ekologisk", "Nordisk", "Mjuk", "Robust", "Lätt", "Värmande", "Smart",
+    "Kompakt", "Handgjord", "Återvunnen", "Premium", "Mörk", "Ljus", "Vintage", "Modern",
+]
+NOUNS = [
+    "Ryggsäck", "Jacka", "Lampa", "Fåtölj", "Skål", "Kopp", "Hörlurar", "Högtalare", "Tröja",
+    "Filt", "Kudde", "Vas", "Choklad", "Ost", "Kaffe", "Leksak", "Byxor", "Mössa", "Kräm", "Kniv",
+]
+DESCRIPTION_WORDS = [
+    "designad", "i", "Sverige", "med", "hållbart", "material", "för", "vardag", "och", "fest",
+    "tillverkad", "av", "ull", "bomull", "ek", "glas", "stål", "perfekt", "gåva", "hela", "året",
+]
+CITIES = [
+    ("Stockholm", "111"), ("Göteborg", "411"), ("Malmö", "211"), ("Uppsala", "753"),
+    ("Västerås", "721"), ("Örebro", "702"), ("Linköping", "581"), ("Helsingborg", "252"),
+    ("Jönköping", "553"), ("Norrköping", "602"), ("Lund", "222"), ("Umeå", "903"),
+    ("Gävle", "802"), ("Borås", "503"), ("Södertälje", "151"), ("Eskilstuna", "632"),
+    ("Halmstad", "302"), ("Växjö", "352"), ("Karlstad", "652"), ("Sundsvall", "852"),
+    ("Luleå", "972"), ("Trollhättan", "461"), ("Östersund", "831"), ("Kiruna", "981"),
+]
+STREETS = ["Industrivägen", "Hamngatan", "Lagervägen", "Terminalgatan", "Logistikvägen", "Godsvägen"]
+
+# Rows generated per block; each block has its own seeded RNG, so the data for
+# a seed is the same however the run is split, and each block is one insert + commit
+GENERATOR_BLOCK_SIZE = 10000
+
+PRODUCT_COLUMNS = ("id",) + crud.BULK_PRODUCT_COLUMNS
+WAREHOUSE_COLUMNS = ("id", "name", "city", "address", "postcode", "capacity")
+INVENTORY_COLUMNS = ("product_id", "warehouse_id", "quantity", "minimum_stock_level")
+
+def _block_rng(seed: int, table: str, block: int) -> random.Random:
+    return random.Random(f"{seed}:{table}:{block}")
+
+def _product_record(rng: random.Random, product_id: int) -> tuple:
+    category = rng.choice(list(CATEGORY_BRANDS))
+    brand = rng.choice(CATEGORY_BRANDS[category])
+    name = f"{brand} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}"
+    description = " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(6, 16))).capitalize()
+    price = round(CATEGORY_PRICES[category] * rng.lognormvariate(0, 0.6), 2)
+    image_url = f"https://cdn.example.se/products/{product_id}.jpg" if rng.random() < 0.8 else None
+    is_active = rng.random() < 0.95
+    search_text = product_search_text(name, brand, description)
+    return (product_id, name, description, price, category, brand, image_url, is_active, search_text)
+
+def _warehouse_record(rng: random.Random, warehouse_id: int) -> tuple:
+    city, postcode_prefix = CITIES[(warehouse_id - 1) % len(CITIES)]
+    return (
+        warehouse_id,
+        f"{city} Warehouse {warehouse_id}",
+        city,
+        f"{rng.choice(STREETS)} {rng.randint(1, 120)}",
+        f"{postcode_prefix}{rng.randint(10, 99)}",
+        rng.randrange(1000, 20000, 100),
+    )
+
+def _inventory_records(rng: random.Random, product_ids: range, warehouse_ids: range, coverage: float) -> list:
+    records = []
+    for product_id in product_ids:
+        for warehouse_id in warehouse_ids:
+            if coverage < 1 and rng.random() >= coverage:
+                continue
+            minimum = rng.choice((5, 10, 10, 20, 50))
+            # About one row in ten is below its alert level, like a busy catalog
+            quantity = rng.randint(0, minimum - 1) if rng.random() < 0.1 else rng.randint(minimum, 500)
+            records.append((product_id, warehouse_id, quantity, minimum))
+    return records
+
+class Progress:
+    """Prints rows written and throughput for one table"""
+
+    def __init__(self, table: str, total: int, enabled: bool = True):
+        self.table = table
+        self.total = total
+        self.enabled = enabled
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def advance(self, rows: int):
+        self.done += rows
+        if self.enabled:
+            elapsed = time.perf_counter() - self.started
+            print(
+                f"\r{self.table:<10} {self.done:>12,}/{self.total:,} rows "
+                f"{self.done / elapsed if elapsed else 0:>10,.0f} rows/s",
+                end="\n" if self.done >= self.total else "",
+                file=sys.stderr,
+                flush=True,
+            )
+
+async def _next_id(db: AsyncSession, model) -> int:
+    return (await db.scalar(select(func.max(model.id))) or 0) + 1
+
+async def _sync_sequences(db: AsyncSession):
+    # Rows were written with explicit ids, which Postgres sequences don't see
+    for table in ("products", "warehouses"):
+        await db.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"
+        ))
+
+async def generate_dataset(
+    db: AsyncSession,
+    products: int,
+    warehouses: int,
+    seed: int = 0,
+    inventory_coverage: float = 1.0,
+    progress: bool = True
+) -> dict:
+    """Append a deterministic synthetic catalog: products, warehouses and stock rows
+
+    The same seed always yields the same rows. Every product is stocked in a
+    random `inventory_coverage` share of the warehouses (all by default), so
+    `products * warehouses` inventory rows are written at full coverage.
+    """
+    product_start = await _next_id(db, models.Product)
+    warehouse_start = await _next_id(db, models.Warehouse)
+    warehouse_ids = range(warehouse_start, warehouse_start + warehouses)
+
+    rng = _block_rng(seed, "warehouses", 0)
+    await crud.copy_rows(db, models.Warehouse, WAREHOUSE_COLUMNS, [
+        _warehouse_record(rng, warehouse_id) for warehouse_id in warehouse_ids
+    ])
+    await db.commit()
+    Progress("warehouses", warehouses, progress).advance(warehouses)
+
+    product_progress = Progress("products", products, progress)
+    for block, start in enumerate(range(0, products, GENERATOR_BLOCK_SIZE)):
+        rng = _block_rng(seed, "products", block)
+        ids = range(product_start + start, product_start + min(start + GENERATOR_BLOCK_SIZE, products))
+        await crud.copy_rows(db, models.Product, PRODUCT_COLUMNS, [_product_record(rng, i) for i in ids])
+        await db.commit()
+        product_progress.advance(len(ids))
+
+    if db.bind.dialect.name == "postgresql":
+        await _sync_sequences(db)
+        await db.commit()
+
+    inventory_rows = 0
+    expected = round(products * warehouses * inventory_coverage)
+    inventory_progress = Progress("inventory", expected, progress)
+    # Blocks of products, sized so each insert is about GENERATOR_BLOCK_SIZE rows
+    products_per_block = max(GENERATOR_BLOCK_SIZE // max(warehouses, 1), 1)
+    for block, start in enumerate(range(0, products, products_per_block)):
+        rng = _block_rng(seed, "inventory", block)
+        ids = range(product_start + start, product_start + min(start + products_per_block, products))
+        records = _inventory_records(rng, ids, warehouse_ids, inventory_coverage)
+        if records:
+            await crud.copy_rows(db, models.Inventory, INVENTORY_COLUMNS, records)
+            await db.commit()
+        inventory_rows += len(records)
+        inventory_progress.advance(len(records))
+    if inventory_progress.done < inventory_progress.total:
+        inventory_progress.total = inventory_progress.done
+        inventory_progress.advance(0)
+
+    # Fresh planner statistics, so measurements run against realistic plans
+    await db.execute(text("ANALYZE"))
+    await bump_versions(db, "products", "warehouses")
+    await db.commit()
+    product_facets.invalidate()
+    return {"products": products, "warehouses": warehouses, "inventory": inventory_rows}
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic catalog")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--warehouses", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--inventory-coverage", type=float, default=1.0,
+        help="Share of warehouses stocking each product (0-1)"
+    )
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--quiet", action="store_true", help="No progress output")
+    args = parser.parse_args()
+
+    from .database import Base, SessionLocal, engine
+
+    async with engine.begin() as conn:
+        if args.reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        if args.reset:
+            # Keep the default users so the generated data can be used through the API
+            await create_initial_data(db, seed=args.seed)
+        counts = await generate_dataset(
+            db,
+            products=args.products,
+            warehouses=args.warehouses,
+            seed=args.seed,
+            inventory_coverage=args.inventory_coverage,
+            progress=not args.quiet,
+        )
+    await engine.dispose()
+    print(
+        f"Generated {counts['products']:,} products, {counts['warehouses']:,} warehouses and "
+        f"{counts['inventory']:,} inventory rows in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,18 +1,52 @@
 """
 Main FastAPI application for Swedish E-commerce Inventory API
 """
-from fastapi import FastAPI, Depends, HTTPException
+import time
+
+# Start of the clock for the startup report in /health
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+import os
+from typing import Optional, Union
+
+import orjson
+from fastapi import (
+    FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
+)
+from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import models, schemas, crud
-from .database import SessionLocal, engine, Base
-from .dependencies import get_db, require_admin, require_admin_or_manager, require_any_role
-from .fake_data import create_initial_data
+from .database import SessionLocal, pool_stats
+from .dependencies import (
+    get_db, get_read_db, get_current_principal, require_admin, require_admin_or_manager, require_any_role
+)
+from .admission import ADMISSION_CONTROL, AdmissionMiddleware, admission_controller
 from .auth_routes import router as auth_router
+from .auth_utils import AUTH_MODE, password_hash_pool
+from .events import OVERFLOW_EVENT, inventory_events
+from .fast_json import encode_rows, json_bytes_response, schema_columns
+from .metrics import MetricsMiddleware, render_metrics
+from .cache import USER_CACHE_SIZE, user_cache
+from .pagination import NEXT_CURSOR_HEADER, decode_cursor, set_next_cursor
+from .replicas import PIN_HEADER, ReplicaPinMiddleware, replica_router
+from .response_cache import response_cache
+from .revocation import revocation_set
+from .search import MIN_PREFIX_LENGTH
+from .sql_profiler import PROFILE_HEADER, SQL_PROFILE, enable_sql_profiler, recent_profiles
+from .token_purge import REFRESH_TOKEN_PURGE_INTERVAL_SECONDS, run as run_token_purge
+from .versions import check_row_etag, conditional_get, page_etag, row_etag
+from .worker_pool import PoolSaturated
+
+logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create tables and seed data on startup; set to "false" when `python -m app.bootstrap`
+# runs as a release step, so workers start without touching the database
+BOOTSTRAP_ON_STARTUP = os.getenv("BOOTSTRAP_ON_STARTUP", "true").lower() == "true"
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -21,6 +55,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Shed load per route class before it queues; inside CORS so browsers can read the 503
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -28,8 +66,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_HEADER, PIN_HEADER],
 )
 
+# Development/staging only: per-request statement log, N+1 warnings and slow-query plans
+if SQL_PROFILE:
+    enable_sql_profiler(app)
+
+# Pins callers that just wrote to the primary so they read their own writes
+if replica_router.replicas:
+    app.add_middleware(ReplicaPinMiddleware)
+
+# Outermost, so recorded latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
+# Shed load quickly instead of queueing without bound when a worker pool is full
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 # Include authentication routes
 app.include_router(auth_router)
 
@@ -45,12 +104,52 @@ def get_current_user_info_fixed(
     """
     return current_user
 
-# Create initial data on startup
+def export_response(model, fmt: str, filename: str) -> StreamingResponse:
+    from .export import EXPORT_MEDIA_TYPES, stream_table
+
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+    return StreamingResponse(
+        stream_table(model, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
 @app.on_event("startup")
-def on_startup():
-    db = SessionLocal()
-    create_initial_data(db)
-    db.close()
+async def on_startup():
+    started = time.perf_counter()
+    if BOOTSTRAP_ON_STARTUP:
+        from .bootstrap import bootstrap
+
+        await bootstrap()
+    bootstrapped = time.perf_counter()
+    if AUTH_MODE == "claims" or USER_CACHE_SIZE > 0:
+        # Loads the revocation set in the background; until then is_fresh() is
+        # false and every request is authorized against the database
+        app.state.revocation_task = asyncio.create_task(revocation_set.run())
+    if REFRESH_TOKEN_PURGE_INTERVAL_SECONDS > 0:
+        app.state.token_purge_task = asyncio.create_task(run_token_purge())
+    if replica_router.replicas:
+        # Reads use the primary until a replica's first health check passes
+        app.state.replica_task = asyncio.create_task(replica_router.run())
+
+    app.state.startup = {
+        "import_ms": round((started - _IMPORT_STARTED) * 1000, 1),
+        "bootstrap_ms": round((bootstrapped - started) * 1000, 1) if BOOTSTRAP_ON_STARTUP else None,
+        "total_ms": round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1),
+    }
+    logger.info("Startup finished: %s", app.state.startup)
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if AUTH_MODE == "claims" or USER_CACHE_SIZE > 0:
+        app.state.revocation_task.cancel()
+    if REFRESH_TOKEN_PURGE_INTERVAL_SECONDS > 0:
+        app.state.token_purge_task.cancel()
+    if replica_router.replicas:
+        app.state.replica_task.cancel()
+        await replica_router.dispose()
+    password_hash_pool.shutdown()
 
 @app.get("/")
 async def root():
@@ -58,124 +157,435 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "startup": app.state.startup,
+        "database_pool": pool_stats(),
+        "admission": admission_controller.stats() if ADMISSION_CONTROL else None,
+        "read_replicas": replica_router.stats(),
+        "password_hashing": password_hash_pool.stats(),
+        "user_cache": user_cache.stats(),
+        "revocation_set": revocation_set.stats(),
+        "inventory_events": inventory_events.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+if SQL_PROFILE:
+    @app.get("/debug/sql-profiles", include_in_schema=False)
+    async def read_sql_profiles(
+        limit: int = 50,
+        repeated_only: bool = False,
+        current_user: models.User = Depends(require_admin)
+    ):
+        """
+        Most recent request profiles, newest first (admin only, SQL_PROFILE=true)
+        """
+        profiles = [profile for profile in reversed(recent_profiles) if not repeated_only or profile.repeated()]
+        return [profile.to_dict() for profile in profiles[:limit]]
 
 # Products endpoints
-@app.get("/products/", response_model=list[schemas.Product])
-def read_products(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_any_role)
+@app.get("/products/", response_model=Union[list[schemas.Product], schemas.ProductPage])
+async def read_products(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    is_active: Optional[bool] = None,
+    facets: bool = False,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(require_any_role),
+    not_modified: None = Depends(conditional_get("products"))
 ):
     """
-    Retrieve all products with pagination (requires authentication)
+    Retrieve products with optional filters and pagination (requires authentication)
+
+    Pass the X-Next-Cursor response header back as `after` to page by cursor
+    instead of offset; `skip` is ignored when `after` is given. With
+    `facets=true` the response is an object holding the page as `items` plus
+    per-category and per-brand counts for the current filters.
     """
-    products = crud.get_products(db, skip=skip, limit=limit)
-    return products
+    cache_key = response_cache.key(request, response)
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    filters = dict(
+        category=category, brand=brand, min_price=min_price, max_price=max_price, is_active=is_active
+    )
+    cursor = decode_cursor(after) if after else None
+    products = await crud.get_products(db, skip=skip, limit=limit, after=cursor, **filters)
+    set_next_cursor(response, products, limit)
+    if facets:
+        page = schemas.ProductPage(
+            items=products,
+            facets=await crud.get_product_facets(db, **filters)
+        )
+        return await response_cache.store(cache_key, ("products",), schemas.ProductPage, page, response)
+    return await response_cache.store(cache_key, ("products",), list[schemas.Product], products, response)
 
 @app.post("/products/", response_model=schemas.Product)
-def create_product(
+async def create_product(
     product: schemas.ProductCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin_or_manager)
 ):
     """
     Create a new product (admin/manager only)
     """
-    return crud.create_product(db=db, product=product)
+    return await crud.create_product(db=db, product=product)
+
+@app.post("/products/import", response_model=schemas.ProductImportResult)
+async def import_products(
+    request: Request,
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_admin_or_manager)
+):
+    """
+    Stream a CSV or NDJSON product catalog into the database (admin/manager only)
+
+    The raw request body is parsed incrementally and inserted in batches, so
+    the file never has to fit in memory. The format comes from `format`
+    ("csv" or "ndjson") or the Content-Type header. Each batch is committed
+    as it completes.
+    """
+    from . import product_import
+
+    fmt = format or product_import.detect_format(request.headers.get("content-type"))
+    if fmt not in product_import.ROW_PARSERS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson, or pass format=csv|ndjson"
+        )
+    try:
+        return await product_import.import_products(db, request.stream(), fmt)
+    except product_import.ProductImportFormatError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+@app.get("/products/search", response_model=list[schemas.Product])
+async def search_products(
+    q: str = Query(..., min_length=MIN_PREFIX_LENGTH, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(require_any_role)
+):
+    """
+    Ranked full-text search over product name, brand and description (requires authentication)
+
+    Matching ignores case and diacritics, and the last word may be a prefix of
+    at least 3 characters, so "fjallraven kank" finds "Fjällräven Kånken".
+    """
+    return await crud.search_products(db, query=q, limit=limit)
+
+@app.get("/products/export")
+async def export_products(
+    format: str = "ndjson",
+    current_user: models.User = Depends(require_any_role)
+):
+    """
+    Stream every product as NDJSON or CSV (requires authentication)
+    """
+    return export_response(models.Product, format, "products")
 
 @app.get("/products/{product_id}", response_model=schemas.Product)
-def read_product(
+async def read_product(
     product_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_any_role)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(require_any_role),
+    not_modified: None = Depends(conditional_get("products"))
 ):
     """
     Get a specific product by ID (requires authentication)
     """
-    db_product = crud.get_product(db, product_id=product_id)
+    cache_key = response_cache.key(request, response)
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    db_product = await crud.get_product(db, product_id=product_id)
     if db_product is None:
         raise HTTPException(status_code=404, detail="Product not found")
-    return db_product
+    return await response_cache.store(cache_key, ("products",), schemas.Product, db_product, response)
 
 # Warehouses endpoints
 @app.get("/warehouses/", response_model=list[schemas.Warehouse])
-def read_warehouses(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(require_any_role)
+async def read_warehouses(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(require_any_role),
+    not_modified: None = Depends(conditional_get("warehouses"))
 ):
     """
     Retrieve all warehouses with pagination (requires authentication)
+
+    Pass the X-Next-Cursor response header back as `after` to page by cursor
+    instead of offset; `skip` is ignored when `after` is given.
     """
-    warehouses = crud.get_warehouses(db, skip=skip, limit=limit)
-    return warehouses
+    cache_key = response_cache.key(request, response)
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    cursor = decode_cursor(after) if after else None
+    warehouses = await crud.get_warehouses(db, skip=skip, limit=limit, after=cursor)
+    set_next_cursor(response, warehouses, limit)
+    return await response_cache.store(cache_key, ("warehouses",), list[schemas.Warehouse], warehouses, response)
 
 @app.post("/warehouses/", response_model=schemas.Warehouse)
-def create_warehouse(
+async def create_warehouse(
     warehouse: schemas.WarehouseCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin_or_manager)
 ):
     """
     Create a new warehouse (admin/manager only)
     """
-    return crud.create_warehouse(db=db, warehouse=warehouse)
+    return await crud.create_warehouse(db=db, warehouse=warehouse)
 
 # Inventory endpoints
+# Inventory lists skip ORM instances and Pydantic: rows go straight to orjson
+INVENTORY_JSON_COLUMNS = schema_columns(models.Inventory, schemas.Inventory)
+# Plus the row version, for the page's ETag; encode_rows ignores the extra column
+INVENTORY_PAGE_COLUMNS = [*INVENTORY_JSON_COLUMNS, models.Inventory.version]
+
 @app.get("/inventory/", response_model=list[schemas.Inventory])
-def read_inventory(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
+async def read_inventory(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(require_any_role)
 ):
     """
     Retrieve all inventory records with pagination (requires authentication)
+
+    Pass the X-Next-Cursor response header back as `after` to page by cursor
+    instead of offset; `skip` is ignored when `after` is given. The ETag
+    covers the page's rows and their versions.
     """
-    inventory = crud.get_inventory_items(db, skip=skip, limit=limit)
-    return inventory
+    cursor = decode_cursor(after) if after else None
+    rows = await crud.get_inventory_items(
+        db, skip=skip, limit=limit, after=cursor, columns=INVENTORY_PAGE_COLUMNS
+    )
+    set_next_cursor(response, rows, limit)
+    check_row_etag(request, response, page_etag("inventory", rows))
+    return json_bytes_response(encode_rows(INVENTORY_JSON_COLUMNS, rows), response)
 
 @app.post("/inventory/", response_model=schemas.Inventory)
-def create_inventory_item(
+async def create_inventory_item(
     inventory: schemas.InventoryCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin_or_manager)
 ):
     """
     Create a new inventory record (admin/manager only)
     """
-    return crud.create_inventory_item(db=db, inventory=inventory)
+    return await crud.create_inventory_item(db=db, inventory=inventory)
+
+@app.post("/inventory/{product_id}/{warehouse_id}/adjust", response_model=schemas.Inventory)
+async def adjust_inventory_item(
+    product_id: int,
+    warehouse_id: int,
+    adjustment: schemas.InventoryAdjust,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_admin_or_manager)
+):
+    """
+    Atomically increment or decrement an inventory quantity (admin/manager only)
+    """
+    db_inventory = await crud.adjust_inventory_quantity(
+        db,
+        product_id=product_id,
+        warehouse_id=warehouse_id,
+        delta=adjustment.delta
+    )
+    if db_inventory is None:
+        if await crud.get_inventory_item(db, product_id=product_id, warehouse_id=warehouse_id) is None:
+            raise HTTPException(status_code=404, detail="Inventory item not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+    return db_inventory
+
+@app.put("/inventory/bulk", response_model=schemas.InventoryBulkResult)
+async def bulk_update_inventory(
+    bulk_update: schemas.InventoryBulkUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_admin_or_manager)
+):
+    """
+    Set many inventory quantities in a single transaction (admin/manager only)
+    """
+    return await crud.bulk_update_inventory_quantities(db, items=bulk_update.items)
+
+@app.get("/inventory/low-stock", response_model=list[schemas.Inventory])
+async def read_low_stock_inventory(
+    request: Request,
+    response: Response,
+    warehouse_id: Optional[int] = None,
+    category: Optional[str] = None,
+    limit: int = 100,
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: models.User = Depends(require_any_role)
+):
+    """
+    Inventory records below their minimum stock level (requires authentication)
+
+    Optionally filtered by warehouse and product category; paged by cursor
+    through the X-Next-Cursor header. The ETag covers the page's rows and
+    their versions.
+    """
+    cursor = decode_cursor(after) if after else None
+    rows = await crud.get_low_stock_items(
+        db, warehouse_id=warehouse_id, category=category, limit=limit, after=cursor,
+        columns=INVENTORY_PAGE_COLUMNS
+    )
+    set_next_cursor(response, rows, limit)
+    check_row_etag(request, response, page_etag("inventory", rows))
+    return json_bytes_response(encode_rows(INVENTORY_JSON_COLUMNS, rows), response)
+
+# Seconds between SSE keep-alive comments on an idle stream
+EVENT_KEEPALIVE_SECONDS = 15
+
+@app.get("/inventory/events")
+async def stream_inventory_events(
+    product_id: Optional[list[int]] = Query(None),
+    warehouse_id: Optional[list[int]] = Query(None),
+    current_user: models.User = Depends(require_any_role)
+):
+    """
+    Server-Sent Events feed of inventory changes (requires authentication)
+
+    Repeat `product_id` / `warehouse_id` to subscribe to several. A final
+    "overflow" event means the client fell behind and should re-fetch.
+    """
+    subscription = inventory_events.subscribe(product_id, warehouse_id)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+                if event is OVERFLOW_EVENT:
+                    return
+        finally:
+            inventory_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/inventory/ws")
+async def inventory_events_websocket(
+    websocket: WebSocket,
+    token: str,
+    product_id: Optional[list[int]] = Query(None),
+    warehouse_id: Optional[list[int]] = Query(None),
+):
+    """
+    WebSocket feed of inventory changes; browsers pass the access token as `token`
+    """
+    async with SessionLocal() as db:
+        try:
+            await get_current_principal(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+    await websocket.accept()
+    subscription = inventory_events.subscribe(product_id, warehouse_id)
+    # The client never needs to send anything; reading just notices disconnects
+    receiver = asyncio.create_task(websocket.receive_text())
+    try:
+        while True:
+            getter = asyncio.create_task(subscription.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                if receiver.exception() is not None:
+                    return
+                receiver = asyncio.create_task(websocket.receive_text())
+                continue
+            event = getter.result()
+            await websocket.send_text(orjson.dumps(event).decode())
+            if event is OVERFLOW_EVENT:
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        inventory_events.unsubscribe(subscription)
+
+@app.get("/inventory/export")
+async def export_inventory(
+    format: str = "ndjson",
+    current_user: models.User = Depends(require_any_role)
+):
+    """
+    Stream every inventory record as NDJSON or CSV (requires authentication)
+    """
+    return export_response(models.Inventory, format, "inventory")
 
 @app.get("/inventory/{product_id}/{warehouse_id}", response_model=schemas.Inventory)
-def read_inventory_item(
+async def read_inventory_item(
+    request: Request,
+    response: Response,
     product_id: int, 
     warehouse_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: models.User = Depends(require_any_role)
 ):
     """
     Get a specific inventory record by product and warehouse IDs (requires authentication)
+
+    The ETag follows the row's own version, so revalidating one item isn't
+    affected by stock changes elsewhere.
     """
-    db_inventory = crud.get_inventory_item(db, product_id=product_id, warehouse_id=warehouse_id)
+    db_inventory = await crud.get_inventory_item(db, product_id=product_id, warehouse_id=warehouse_id)
     if db_inventory is None:
         raise HTTPException(status_code=404, detail="Inventory item not found")
+    check_row_etag(request, response, row_etag(
+        "inventory", db_inventory.id, db_inventory.version, db_inventory.quantity, db_inventory.minimum_stock_level
+    ))
     return db_inventory
 
 @app.put("/inventory/{product_id}/{warehouse_id}", response_model=schemas.Inventory)
-def update_inventory_item(
+async def update_inventory_item(
     product_id: int, 
     warehouse_id: int, 
     inventory_update: schemas.InventoryUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin_or_manager)
 ):
     """
     Update an inventory item's quantity (admin/manager only)
     """
-    return crud.update_inventory_quantity(
+    return await crud.update_inventory_quantity(
         db=db, 
         product_id=product_id, 
         warehouse_id=warehouse_id, 
@@ -184,28 +594,50 @@ def update_inventory_item(
 
 # Admin-only user management endpoints
 @app.get("/users/", response_model=list[schemas.User])
-def read_users(
+async def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin)
 ):
     """
     Retrieve all users (admin only)
+
+    Pass the X-Next-Cursor response header back as `after` to page by cursor
+    instead of offset; `skip` is ignored when `after` is given.
     """
-    users = crud.get_users(db, skip=skip, limit=limit)
+    cursor = decode_cursor(after) if after else None
+    users = await crud.get_users(db, skip=skip, limit=limit, after=cursor)
+    set_next_cursor(response, users, limit)
     return users
 
 @app.get("/users/{user_id}", response_model=schemas.User)
-def read_user(
+async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(require_admin)
 ):
     """
     Get a specific user by ID (admin only)
     """
-    user = crud.get_user(db, user_id=user_id)
+    user = await crud.get_user(db, user_id=user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+@app.put("/users/{user_id}", response_model=schemas.User)
+async def update_user(
+    user_id: int,
+    user_update: schemas.UserUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(require_admin)
+):
+    """
+    Change a user's role or active state (admin only)
+    """
+    user = await crud.update_user(db, user_id=user_id, user_update=user_update)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
\ No newline at end of file
+    return user
@@ -0,0 +1,147 @@
+"""
+Prometheus metrics: HTTP request latency per route and database time per statement
+"""
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest
+)
+from sqlalchemy import event
+
+# With several worker processes, point this at a shared empty directory so
+# /metrics aggregates all of them (prometheus_client multiprocess mode)
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter("http_requests_total", "HTTP responses by route and status", ["method", "route", "status"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum")
+DB_STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "Database statement execution time by statement type",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+DB_STATEMENTS_PER_REQUEST = Histogram(
+    "db_statements_per_request",
+    "Database statements executed while handling one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection")
+# livesum: summed over workers, comparable with the server's max_connections
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Pooled connections in use", multiprocess_mode="livesum"
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections", "Connections open beyond pool_size", multiprocess_mode="livesum"
+)
+ADMISSION_LIMIT = Gauge(
+    "admission_concurrency_limit", "Current adaptive concurrency limit per route class",
+    ["route_class"], multiprocess_mode="livesum",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight", "Admitted requests being handled per route class",
+    ["route_class"], multiprocess_mode="livesum",
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests shed with 503 per route class", ["route_class"]
+)
+
+# Statement types kept as label values; anything else is reported as OTHER
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+# Statements run by the current request; None outside a request
+_request_statements: ContextVar[Optional[list]] = ContextVar("request_statements", default=None)
+
+def observe_pool_wait(seconds: float, timed_out: bool = False):
+    DB_POOL_WAIT.observe(seconds)
+    if timed_out:
+        DB_POOL_TIMEOUTS.inc()
+
+def observe_pool_occupancy(checked_out: int, overflow: int):
+    DB_POOL_CHECKED_OUT.set(checked_out)
+    DB_POOL_OVERFLOW.set(overflow)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    head = statement.lstrip()[:10].split(None, 1)
+    operation = head[0].upper() if head else "OTHER"
+    DB_STATEMENT_LATENCY.labels(operation if operation in _OPERATIONS else "OTHER").observe(
+        time.perf_counter() - started
+    )
+    statements = _request_statements.get()
+    if statements is not None:
+        statements[0] += 1
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+def instrument_engine(engine):
+    """Record statement timings from an engine (the sync_engine of an AsyncEngine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and statement counts per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status_code = 500
+        started = time.perf_counter()
+        statements = [0]
+        token = _request_statements.set(statements)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            _request_statements.reset(token)
+            # The template ("/products/{product_id}") keeps label cardinality bounded
+            route = scope.get("route")
+            route_label = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, route_label).observe(time.perf_counter() - started)
+            REQUESTS.labels(method, route_label, str(status_code)).inc()
+            DB_STATEMENTS_PER_REQUEST.labels(route_label).observe(statements[0])
+
+def render_metrics() -> tuple[bytes, str]:
+    """Exposition text for all metrics, aggregated over processes in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -1,12 +1,13 @@
 """
 SQLAlchemy models for database tables
 """
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Text, DateTime, Enum
+from sqlalchemy import DDL, Boolean, Column, ForeignKey, Integer, String, Float, Text, DateTime, Enum, Index, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
 
 from .database import Base
+from .search import product_search_text
 
 class UserRole(enum.Enum):
     admin = "admin"
@@ -21,21 +22,28 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     role = Column(Enum(UserRole), default=UserRole.viewer, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Access tokens issued before this carry outdated claims (role or active state changed)
+    tokens_valid_after = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    token = Column(String(500), unique=True, index=True, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    # SHA-256 hex digest of the JWT: fixed-size index, and a leaked table yields no usable tokens
+    token_hash = Column(String(64), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationship
     user = relationship("User")
 
+def _default_product_search_text(context):
+    params = context.get_current_parameters()
+    return product_search_text(params.get("name"), params.get("brand"), params.get("description"))
+
 class Product(Base):
     __tablename__ = "products"
 
@@ -47,10 +55,28 @@ class Product(Base):
     brand = Column(String(50))
     image_url = Column(String(200))
     is_active = Column(Boolean, default=True)
+    # Diacritic-folded name, brand and description; filled in on insert
+    search_text = Column(Text, default=_default_product_search_text)
 
     # Relationship with inventory
     inventory = relationship("Inventory", back_populates="product")
 
+    __table_args__ = (
+        # Composite indexes for faceted filtering on GET /products/
+        Index("ix_products_category_brand_price", "category", "brand", "price"),
+        Index("ix_products_brand_price", "brand", "price"),
+    )
+
+# Full-text vector for /products/search, stored so ranking doesn't rebuild it per
+# match. Postgres only, and unmapped so loading products never fetches it
+event.listen(Product.__table__, "after_create", DDL(
+    "ALTER TABLE products ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(search_text, ''))) STORED"
+).execute_if(dialect="postgresql"))
+event.listen(Product.__table__, "after_create", DDL(
+    "CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)"
+).execute_if(dialect="postgresql"))
+
 class Warehouse(Base):
     __tablename__ = "warehouses"
 
@@ -72,7 +98,29 @@ class Inventory(Base):
     warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=False)
     quantity = Column(Integer, default=0, nullable=False)
     minimum_stock_level = Column(Integer, default=10)  # Alert when stock below this level
+    # Bumped with every quantity change; the item's ETag. A server default, since COPY skips client ones
+    version = Column(Integer, server_default="1", nullable=False)
 
     # Relationships
     product = relationship("Product", back_populates="inventory")
-    warehouse = relationship("Warehouse", back_populates="inventory")
\ No newline at end of file
+    warehouse = relationship("Warehouse", back_populates="inventory")
+
+    __table_args__ = (
+        # Partial index holding only rows below their alert level, so low-stock
+        # lookups stay cheap however large the table grows
+        Index(
+            "ix_inventory_low_stock",
+            "warehouse_id",
+            "id",
+            postgresql_where=quantity < minimum_stock_level,
+            sqlite_where=quantity < minimum_stock_level,
+        ),
+    )
+
+class TableVersion(Base):
+    """Change counter for products and warehouses, bumped by crud writes; drives ETag / 304 responses"""
+    __tablename__ = "table_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,53 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints
+"""
+import base64
+import binascii
+import json
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key values of the last row into an opaque cursor"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, types: Sequence[type] = (int,)) -> list:
+    """Decode an opaque cursor, checking it matches the expected sort key types"""
+    invalid_cursor = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise invalid_cursor
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise invalid_cursor
+    for value, expected in zip(values, types):
+        # bool is a subclass of int, so reject it explicitly
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise invalid_cursor
+    return values
+
+def paginate_after(query, columns: Sequence, after: Optional[list]):
+    """Order a query by the sort key columns and skip past the cursor position"""
+    query = query.order_by(*columns)
+    if after is None:
+        return query
+    if len(columns) == 1:
+        return query.filter(columns[0] > after[0])
+    return query.filter(tuple_(*columns) > tuple_(*after))
+
+def set_next_cursor(response: Response, items: list, limit: int, keys: Sequence[str] = ("id",)):
+    """Expose the cursor of the next page when the current page is full"""
+    if items and len(items) >= limit:
+        last = items[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, key) for key in keys])
@@ -0,0 +1,212 @@
+"""
+Streaming product catalog import from CSV or NDJSON request bodies
+"""
+import codecs
+import csv
+import logging
+import math
+from typing import AsyncIterator, Optional
+
+import orjson
+from pydantic import ValidationError
+from sqlalchemy import String
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted (and committed) per batch
+IMPORT_BATCH_SIZE = 5000
+# Longest accepted line; bounds memory for bodies without newlines
+MAX_LINE_LENGTH = 1024 * 1024
+# Per-row errors kept in the response; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Column limits the database enforces, checked up front so a row fails alone
+STRING_LIMITS = {
+    column.name: column.type.length
+    for column in models.Product.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
+
+class ProductImportFormatError(ValueError):
+    """Raised when the body cannot be parsed as the declared format at all"""
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield it line by line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+        if len(pending) > MAX_LINE_LENGTH:
+            raise ProductImportFormatError(f"Line longer than {MAX_LINE_LENGTH} characters")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+def _read_csv_record(lines: list[str]):
+    """Parse one record from `lines`; None when it continues past them (an open quoted field)"""
+    starved = False
+
+    def source():
+        nonlocal starved
+        yield from lines
+        # The reader only asks for another line while a quoted field is open
+        starved = True
+
+    fields = next(csv.reader(source()), [])
+    return None if starved else fields
+
+async def iter_csv_rows(lines: AsyncIterator[str]):
+    """Yield (line number, row dict, error) for each CSV record after the header row"""
+    header = None
+    pending = []
+    pending_length = 0
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        pending.append(line + "\n")
+        pending_length += len(line)
+        record_line = line_number - len(pending) + 1
+        try:
+            fields = _read_csv_record(pending)
+        except csv.Error as exc:
+            fields, error = [], f"Invalid CSV: {exc}"
+        else:
+            error = None
+        if fields is None:
+            if pending_length > MAX_LINE_LENGTH:
+                raise ProductImportFormatError(f"Unterminated quoted field starting on line {record_line}")
+            continue
+        pending = []
+        pending_length = 0
+
+        if error is not None:
+            yield record_line, None, error
+            continue
+        if not fields or (len(fields) == 1 and not fields[0].strip()):
+            continue
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        if len(fields) != len(header):
+            yield record_line, None, f"Expected {len(header)} fields, got {len(fields)}"
+            continue
+        # Empty CSV cells mean "not provided"
+        yield record_line, {key: value if value != "" else None for key, value in zip(header, fields)}, None
+
+    if pending:
+        yield line_number - len(pending) + 1, None, "Unterminated quoted field"
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]):
+    """Yield (line number, row dict, error) for each NDJSON line"""
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = orjson.loads(line)
+        except orjson.JSONDecodeError as exc:
+            yield line_number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, data, None
+
+ROW_PARSERS = {
+    "csv": iter_csv_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+    )
+
+def _check_columns(product: dict) -> Optional[str]:
+    """Reasons the database would reject a validated product, if any"""
+    problems = []
+    # NaN and infinity pass float validation but not a NOT NULL or numeric column
+    if not math.isfinite(product["price"]):
+        problems.append("price: Input should be a finite number")
+    for field, length in STRING_LIMITS.items():
+        value = product.get(field)
+        if value is not None and len(value) > length:
+            problems.append(f"{field}: String should have at most {length} characters")
+    return "; ".join(problems) or None
+
+async def _insert_batch(db: AsyncSession, batch: list[tuple[int, dict]], record_error) -> int:
+    try:
+        return await crud.bulk_insert_products(db, [product for _, product in batch])
+    except DBAPIError as exc:
+        logger.warning("Product import batch rejected, retrying row by row: %s", exc.orig)
+    # One row at a time, to report the lines the database rejects and keep the rest
+    errors = await crud.insert_products_one_by_one(db, [product for _, product in batch])
+    for (line, _), error in zip(batch, errors):
+        if error is not None:
+            record_error(line, f"Rejected by the database: {error}")
+    return errors.count(None)
+
+async def import_products(db: AsyncSession, chunks: AsyncIterator[bytes], fmt: str) -> schemas.ProductImportResult:
+    """Validate rows as they stream in and insert them in batches"""
+    processed = imported = failed = 0
+    errors = []
+    batch = []
+
+    def record_error(line: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(schemas.ProductImportRowError(line=line, error=message))
+
+    async for line, data, error in ROW_PARSERS[fmt](iter_lines(chunks)):
+        processed += 1
+        if error is not None:
+            record_error(line, error)
+            continue
+        try:
+            product = schemas.ProductCreate(**data).dict()
+        except ValidationError as exc:
+            record_error(line, _format_validation_error(exc))
+            continue
+        error = _check_columns(product)
+        if error is not None:
+            record_error(line, error)
+            continue
+
+        batch.append((line, product))
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            imported += await _insert_batch(db, batch, record_error)
+            batch = []
+            logger.info("Product import: %d rows processed, %d imported, %d failed", processed, imported, failed)
+
+    if batch:
+        imported += await _insert_batch(db, batch, record_error)
+    logger.info("Product import finished: %d rows processed, %d imported, %d failed", processed, imported, failed)
+
+    return schemas.ProductImportResult(
+        processed=processed,
+        imported=imported,
+        failed=failed,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+    )
@@ -0,0 +1,213 @@
+"""
+Read-replica routing for read-only endpoints
+
+Set DATABASE_REPLICA_URLS to a comma-separated list of replica URLs. Read
+endpoints take their session from `get_read_db`, which picks a healthy replica
+round-robin and falls back to the primary when none is healthy. A caller whose
+request committed on the primary is pinned to it for REPLICA_PIN_SECONDS, so
+they read their own writes despite replication lag. The pin follows the
+authenticated user within a worker process; across workers it travels in the
+X-DB-Pin response header (echoed back by the client) or the db_pin cookie.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import Optional
+
+from fastapi import Depends, Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .auth_utils import verify_token
+from .database import PrimarySession, create_database_engine, get_db
+from .metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Seconds between health checks; also the timeout of each check
+REPLICA_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_CHECK_INTERVAL_SECONDS", "5"))
+# How long a caller reads from the primary after a write; keep above the usual replication lag
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+PIN_COOKIE = "db_pin"
+# Same value as the cookie, for API clients without a cookie jar to echo back
+PIN_HEADER = "X-DB-Pin"
+
+# Whether the current request committed on the primary; None outside a request
+_request_wrote: ContextVar[Optional[list]] = ContextVar("request_wrote", default=None)
+# User id -> time until which their reads go to the primary, in this process
+_user_pins: dict[int, float] = {}
+# Expired pins are swept once the map grows past this
+_USER_PINS_SWEEP_SIZE = 10000
+
+class Replica:
+    def __init__(self, url: str):
+        # Occupancy gauges and pool_stats() describe the primary's pool
+        self.engine = create_database_engine(url, poolclass=AsyncAdaptedQueuePool)
+        instrument_engine(self.engine.sync_engine)
+        self.sessionmaker = async_sessionmaker(
+            self.engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+        # Unhealthy until the first check passes
+        self.healthy = False
+        self.reads = 0
+        self.last_error: Optional[str] = None
+
+    def mark_unhealthy(self, error: Exception):
+        if self.healthy:
+            logger.warning("Replica %s unhealthy: %s", self.name, error)
+        self.healthy = False
+        self.last_error = str(error)
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+class ReplicaRouter:
+    """Round-robin over healthy replicas, with periodic health checks"""
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = 0
+        self.primary_reads = 0
+
+    def choose(self, pinned: bool = False) -> Optional[Replica]:
+        """Next healthy replica, or None to read from the primary"""
+        if not pinned:
+            count = len(self.replicas)
+            for offset in range(count):
+                replica = self.replicas[(self._next + offset) % count]
+                if replica.healthy:
+                    self._next = (self._next + offset + 1) % count
+                    replica.reads += 1
+                    return replica
+        self.primary_reads += 1
+        return None
+
+    async def check(self, replica: Replica):
+        try:
+            async with replica.engine.connect() as conn:
+                await asyncio.wait_for(conn.execute(text("SELECT 1")), REPLICA_CHECK_INTERVAL_SECONDS)
+        except Exception as error:
+            replica.mark_unhealthy(error)
+        else:
+            if not replica.healthy:
+                logger.info("Replica %s healthy", replica.name)
+            replica.healthy = True
+            replica.last_error = None
+
+    async def run(self):
+        """Check every replica, then again every REPLICA_CHECK_INTERVAL_SECONDS"""
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL_SECONDS)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"url": replica.name, "healthy": replica.healthy, "reads": replica.reads, "last_error": replica.last_error}
+                for replica in self.replicas
+            ],
+        }
+
+replica_router = ReplicaRouter(DATABASE_REPLICA_URLS)
+
+@event.listens_for(PrimarySession, "after_commit")
+def _record_write(session):
+    wrote = _request_wrote.get()
+    if wrote is not None:
+        wrote[0] = True
+
+def _bearer_user_id(authorization: Optional[str]) -> Optional[int]:
+    # Only routes pins: the endpoint's own dependencies still authenticate the request
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    token_data = verify_token(token)
+    return token_data.user_id if token_data is not None else None
+
+def _pin_user(user_id: int, until: float):
+    now = time.time()
+    if len(_user_pins) > _USER_PINS_SWEEP_SIZE:
+        for expired in [pinned for pinned, pinned_until in _user_pins.items() if pinned_until <= now]:
+            del _user_pins[expired]
+    _user_pins[user_id] = until
+
+def _pinned_until(value: Optional[str]) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+def _pinned(request: Request) -> bool:
+    wrote = _request_wrote.get()
+    if wrote is not None and wrote[0]:
+        return True
+    now = time.time()
+    if max(_pinned_until(request.cookies.get(PIN_COOKIE)), _pinned_until(request.headers.get(PIN_HEADER))) > now:
+        return True
+    user_id = _bearer_user_id(request.headers.get("authorization"))
+    return user_id is not None and _user_pins.get(user_id, 0) > now
+
+async def get_read_db(request: Request, primary: AsyncSession = Depends(get_db)):
+    """Session for read-only endpoints: a healthy replica, otherwise the primary"""
+    replica = replica_router.choose(pinned=_pinned(request)) if replica_router.replicas else None
+    if replica is None:
+        # The request's own primary session: holding a second primary connection
+        # while waiting for the first could exhaust the pool and deadlock
+        yield primary
+        return
+    async with replica.sessionmaker() as db:
+        try:
+            yield db
+        except (exc.OperationalError, exc.InterfaceError) as error:
+            # Fail this request, but route the next ones elsewhere until a check passes
+            replica.mark_unhealthy(error)
+            raise
+
+class ReplicaPinMiddleware:
+    """Pins the caller of a request that committed on the primary: by user, header and cookie"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        wrote = [False]
+        token = _request_wrote.set(wrote)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and wrote[0]:
+                until = int(time.time()) + REPLICA_PIN_SECONDS
+                user_id = _bearer_user_id(dict(scope["headers"]).get(b"authorization", b"").decode("latin-1"))
+                if user_id is not None:
+                    _pin_user(user_id, until)
+                cookie = SimpleCookie()
+                cookie[PIN_COOKIE] = str(until)
+                cookie[PIN_COOKIE].update(
+                    {"max-age": REPLICA_PIN_SECONDS, "path": "/", "httponly": True, "samesite": "lax"}
+                )
+                header = cookie.output(header="").strip()
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"set-cookie", header.encode()),
+                    (PIN_HEADER.lower().encode(), str(until).encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_wrote.reset(token)
@@ -0,0 +1,202 @@
+"""
+Cache of serialized JSON responses for hot read endpoints
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+from urllib.parse import urlencode
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from .fast_json import json_bytes_response
+
+logger = logging.getLogger(__name__)
+
+# Entries and total body bytes kept by the in-memory backend
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+# e.g. redis://cache:6379/0 to share entries and invalidations between workers; needs `redis`
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+
+class MemoryBackend:
+    """LRU of (body, headers) bounded by entry count and total body size"""
+
+    def __init__(self, maxsize: int, max_bytes: int, ttl: float):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._tags: dict[str, set] = {}
+        self._bytes = 0
+
+    async def get(self, key: str) -> Optional[tuple]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, body, headers, _ = entry
+        if expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return body, headers
+
+    async def set(self, key: str, body: bytes, headers: dict, tags: tuple):
+        if len(body) > self.max_bytes:
+            return
+        self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, body, headers, tags)
+        self._bytes += len(body)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                removed += self._remove(key)
+        return removed
+
+    def _remove(self, key: str) -> int:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return 0
+        _, body, _, tags = entry
+        self._bytes -= len(body)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+        return 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+class RedisBackend:
+    """Shared backend: entries expire after `ttl`, tags are Redis sets of keys"""
+
+    def __init__(self, url: str, ttl: float):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("RESPONSE_CACHE_URL is set but the `redis` package is not installed") from exc
+        self.url = url
+        self.ttl = int(ttl)
+        self._redis = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[tuple]:
+        value = await self._redis.get("response:" + key)
+        if value is None:
+            return None
+        headers, body = value.split(b"\n", 1)
+        return body, orjson.loads(headers)
+
+    async def set(self, key: str, body: bytes, headers: dict, tags: tuple):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.set("response:" + key, orjson.dumps(headers) + b"\n" + body, ex=self.ttl)
+            for tag in tags:
+                pipe.sadd("response-tag:" + tag, key)
+                pipe.expire("response-tag:" + tag, self.ttl)
+            await pipe.execute()
+
+    async def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        for tag in tags:
+            keys = await self._redis.smembers("response-tag:" + tag)
+            await self._redis.delete("response-tag:" + tag)
+            if keys:
+                removed += await self._redis.delete(*("response:" + key.decode() for key in keys))
+        return removed
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "ttl": self.ttl}
+
+@lru_cache(maxsize=None)
+def _adapter(response_model) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+def render_json(response_model, data: Any) -> bytes:
+    """Encode data through a response model exactly as FastAPI would"""
+    adapter = _adapter(response_model)
+    content = adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json")
+    return JSONResponse(content).body
+
+class ResponseCache:
+    """Serialized response bodies keyed by route, query and table versions
+
+    The key includes the ETag set by conditional_get, so an entry written
+    before a table changed is never served again, even by a worker that missed
+    the invalidation; explicit tag invalidation frees such entries right away.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def key(self, request: Request, response: Response) -> str:
+        query = urlencode(sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}#{response.headers.get('etag', '')}"
+
+    async def get(self, key: str) -> Optional[Response]:
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        body, headers = entry
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def store(self, key: str, tags: tuple, response_model, data: Any, response: Response) -> Response:
+        """Render data, cache it under the given tags and return it as a response"""
+        # ETag, Last-Modified, X-Next-Cursor and the like travel with the body
+        rendered = json_bytes_response(render_json(response_model, data), response)
+        headers = {
+            name: value for name, value in rendered.headers.items()
+            if name not in ("content-length", "content-type")
+        }
+        await self.backend.set(key, rendered.body, headers, tags)
+        return rendered
+
+    async def invalidate(self, *tags: str):
+        """Drop entries under the given tags; call right after the write commits
+
+        A backend failure is logged rather than raised: the write has already
+        committed, and its version bump keeps the old entries from being served.
+        """
+        try:
+            self.invalidated += await self.backend.invalidate(tags)
+        except Exception:
+            logger.exception("Response cache invalidation failed for %s", ", ".join(tags))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidated": self.invalidated,
+        }
+
+response_cache = ResponseCache(
+    RedisBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL_SECONDS) if RESPONSE_CACHE_URL
+    else MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL_SECONDS)
+)
@@ -0,0 +1,110 @@
+"""
+In-memory set of users whose token claims can no longer be trusted on their own
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select
+
+from . import models
+from .auth_utils import ACCESS_TOKEN_EXPIRE_MINUTES
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+# Claims are only trusted while the set is at most this many refresh intervals old
+REVOCATION_MAX_MISSED_REFRESHES = 3
+
+def _epoch(value: datetime) -> float:
+    # Stored as naive UTC (datetime.utcnow) on backends that drop the zone
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class RevocationSet:
+    """Users whose tokens must be re-checked against the database before being authorized
+
+    Holds inactive users, plus the time each recently changed user's tokens
+    became valid again (role change, deactivation): an access token issued
+    before then may carry out-of-date claims, even once the user has signed
+    in again and holds newer tokens.
+    """
+
+    def __init__(self, refresh_seconds: float, access_token_minutes: int):
+        self.refresh_seconds = refresh_seconds
+        self.access_token_minutes = access_token_minutes
+        self._inactive: frozenset = frozenset()
+        # user id -> epoch seconds before which its access tokens are stale
+        self._valid_after: dict = {}
+        # user id -> (monotonic time added, epoch seconds valid after)
+        self._local: dict = {}
+        self._refreshed_at = None
+
+    def revoked(self, user_id: int, since: Optional[float]) -> bool:
+        """Whether the user is inactive or changed after `since` (epoch seconds)
+
+        `since` is when a token was issued, or when a cached copy of the user
+        was loaded; either is out of date when this is true.
+        """
+        if user_id in self._inactive:
+            return True
+        valid_after = self._valid_after.get(user_id)
+        if user_id in self._local:
+            local = self._local[user_id][1]
+            valid_after = local if valid_after is None else max(valid_after, local)
+        # iat has whole seconds, so a token from the same second as the change is
+        # treated as older; that only costs it a database check
+        return valid_after is not None and (since is None or since < valid_after)
+
+    def add(self, user_id: int, valid_after: datetime):
+        """Revoke a user's earlier tokens in this process right away, ahead of the next refresh"""
+        self._local[user_id] = (time.monotonic(), _epoch(valid_after))
+
+    def is_fresh(self) -> bool:
+        if self._refreshed_at is None:
+            return False
+        max_age = self.refresh_seconds * REVOCATION_MAX_MISSED_REFRESHES
+        return time.monotonic() - self._refreshed_at < max_age
+
+    async def refresh(self, db):
+        started = time.monotonic()
+        # Only changes within an access token's lifetime can leave a live
+        # access token behind, which keeps the set small
+        recent = datetime.utcnow() - timedelta(minutes=self.access_token_minutes)
+        inactive_users = select(models.User.id).where(models.User.is_active == False)
+        changed_users = select(models.User.id, models.User.tokens_valid_after).where(
+            models.User.tokens_valid_after >= recent
+        )
+
+        self._inactive = frozenset((await db.scalars(inactive_users)).all())
+        self._valid_after = {
+            user_id: _epoch(valid_after) for user_id, valid_after in (await db.execute(changed_users)).all()
+        }
+        # Local revocations made while the queries ran may be missing from their snapshot
+        self._local = {
+            user_id: entry for user_id, entry in self._local.items() if entry[0] >= started
+        }
+        self._refreshed_at = started
+
+    async def run(self):
+        """Refresh the set from the database now and then periodically until cancelled"""
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    await self.refresh(db)
+            except Exception:
+                logger.exception("Failed to refresh the token revocation set")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._inactive) + len(self._valid_after) + len(self._local),
+            "fresh": self.is_fresh(),
+        }
+
+revocation_set = RevocationSet(REVOCATION_REFRESH_SECONDS, ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -3,7 +3,7 @@ Pydantic schemas for request/response validation
 """
 from typing import Optional
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from .models import UserRole
 
 # Product schemas
@@ -25,6 +25,25 @@ class Product(ProductBase):
     class Config:
         from_attributes = True  # Replaces orm_mode = True in Pydantic v2
 
+class ProductFacets(BaseModel):
+    categories: dict[str, int]
+    brands: dict[str, int]
+
+class ProductPage(BaseModel):
+    items: list[Product]
+    facets: ProductFacets
+
+class ProductImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ProductImportResult(BaseModel):
+    processed: int
+    imported: int
+    failed: int
+    errors: list[ProductImportRowError]
+    errors_truncated: bool
+
 # Warehouse schemas
 class WarehouseBase(BaseModel):
     name: str
@@ -55,12 +74,34 @@ class InventoryCreate(InventoryBase):
 class InventoryUpdate(BaseModel):
     quantity: int
 
+class InventoryAdjust(BaseModel):
+    delta: int  # Signed change, e.g. -2 when two units are picked for an order
+
 class Inventory(InventoryBase):
     id: int
 
     class Config:
         from_attributes = True
 
+class InventoryQuantity(BaseModel):
+    product_id: int
+    warehouse_id: int
+    quantity: int
+
+class InventoryBulkUpdate(BaseModel):
+    items: list[InventoryQuantity] = Field(..., max_length=50000)
+
+class InventoryBulkItemResult(BaseModel):
+    product_id: int
+    warehouse_id: int
+    status: str  # "updated", "unchanged" or "not_found"
+
+class InventoryBulkResult(BaseModel):
+    updated: int
+    unchanged: int
+    not_found: int
+    results: list[InventoryBulkItemResult]
+
 # User schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -69,6 +110,10 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserUpdate(BaseModel):
+    role: Optional[UserRole] = None
+    is_active: Optional[bool] = None
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -91,6 +136,7 @@ class TokenData(BaseModel):
     email: Optional[str] = None
     user_id: Optional[int] = None
     role: Optional[str] = None
+    issued_at: Optional[int] = None
 
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Text normalization for product search
+"""
+import re
+import unicodedata
+from typing import Optional
+
+# Letters that Unicode decomposition does not split into base letter + accent
+_EXTRA_FOLDS = str.maketrans({"ø": "o", "æ": "ae", "œ": "oe", "đ": "d", "ł": "l", "þ": "th"})
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+# Shorter prefixes match too much of a large catalog to rank quickly
+MIN_PREFIX_LENGTH = 3
+
+def fold_text(text: Optional[str]) -> str:
+    """Lowercase, strip diacritics and punctuation: "Fjällräven Kånken" -> "fjallraven kanken" """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.casefold()).translate(_EXTRA_FOLDS)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", stripped).strip()
+
+def product_search_text(name: Optional[str], brand: Optional[str], description: Optional[str]) -> str:
+    """Folded text a product is matched against"""
+    return " ".join(part for part in (fold_text(name), fold_text(brand), fold_text(description)) if part)
+
+def search_terms(query: str) -> list[str]:
+    return fold_text(query).split()
+
+def prefix_tsquery(terms: list[str]) -> str:
+    """Postgres tsquery matching every term, the last one as a prefix; terms are already [a-z0-9]+
+
+    The prefix is only what is still being typed, and needs MIN_PREFIX_LENGTH
+    characters; other terms match whole words.
+    """
+    *words, last = terms
+    if len(last) >= MIN_PREFIX_LENGTH:
+        last += ":*"
+    return " & ".join([*words, last])
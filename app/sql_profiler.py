@@ -0,0 +1,158 @@
+"""
+Per-request SQL profiler for development and staging (SQL_PROFILE=true)
+
+Records every statement a request runs with its duration and flags statement
+shapes repeated within one request, the signature of N+1 lazy loading. Slow
+statements are logged with their EXPLAIN plan once the response has been sent.
+"""
+import logging
+import os
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from .database import engine
+from .replicas import replica_router
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() == "true"
+# Statements slower than this are logged with their plan
+SQL_PROFILE_SLOW_MS = float(os.getenv("SQL_PROFILE_SLOW_MS", "100"))
+# Identical statements run this often in one request are reported as N+1
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+# Profiles kept for GET /debug/sql-profiles
+SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "200"))
+
+PROFILE_HEADER = "X-SQL-Profile"
+
+# Only these are safe to EXPLAIN (without ANALYZE nothing is executed)
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+class RequestProfile:
+    """Statements run while handling one request"""
+
+    __slots__ = ("method", "path", "status", "started", "duration_ms", "statements")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started = time.time()
+        self.duration_ms = None
+        # (statement, parameters, milliseconds, executemany)
+        self.statements: list[tuple] = []
+
+    def repeated(self) -> dict:
+        """Statement texts run at least SQL_PROFILE_REPEAT_THRESHOLD times"""
+        counts = Counter(statement for statement, _, _, _ in self.statements)
+        return {statement: count for statement, count in counts.items() if count >= SQL_PROFILE_REPEAT_THRESHOLD}
+
+    def db_ms(self) -> float:
+        return sum(milliseconds for _, _, milliseconds, _ in self.statements)
+
+    def header(self) -> str:
+        return f"statements={len(self.statements)}; db_ms={self.db_ms():.2f}; repeated={len(self.repeated())}"
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": self.duration_ms,
+            "db_ms": round(self.db_ms(), 3),
+            "statement_count": len(self.statements),
+            "repeated": [
+                {"statement": statement, "count": count} for statement, count in self.repeated().items()
+            ],
+            "statements": [
+                {"statement": statement, "ms": round(milliseconds, 3), "executemany": executemany}
+                for statement, _, milliseconds, executemany in self.statements
+            ],
+        }
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+recent_profiles: deque = deque(maxlen=SQL_PROFILE_HISTORY)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["profile_started"].pop()
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.statements.append(
+            (statement, parameters, (time.perf_counter() - started) * 1000, executemany)
+        )
+
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("profile_started"):
+        connection.info["profile_started"].pop()
+
+async def explain(statement: str, parameters) -> str:
+    """Plan of a statement, fetched on a separate connection so the request's transaction is untouched"""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(prefix + statement, parameters or ())
+        return "\n".join(" ".join(str(value) for value in row) for row in result)
+
+async def _report(profile: RequestProfile):
+    for statement, count in profile.repeated().items():
+        logger.warning(
+            "Possible N+1 in %s %s: statement ran %d times:\n%s", profile.method, profile.path, count, statement
+        )
+    for statement, parameters, milliseconds, executemany in profile.statements:
+        if milliseconds < SQL_PROFILE_SLOW_MS:
+            continue
+        plan = "(not explained)"
+        if not executemany and statement.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                plan = await explain(statement, parameters)
+            except Exception as exc:
+                plan = f"(EXPLAIN failed: {exc})"
+        logger.warning(
+            "Slow statement (%.1f ms) in %s %s:\n%s\nPlan:\n%s",
+            milliseconds, profile.method, profile.path, statement, plan,
+        )
+
+class SQLProfilerMiddleware:
+    """Profiles each HTTP request and adds a summary header to its response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                # Statements of a streamed body run later and are only in the debug endpoint
+                message["headers"] = [*message.get("headers", []), (PROFILE_HEADER.lower().encode(), profile.header().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            recent_profiles.append(profile)
+            # The response has been sent by now, so EXPLAIN doesn't delay the client
+            await _report(profile)
+
+def enable_sql_profiler(app):
+    for profiled in (engine, *(replica.engine for replica in replica_router.replicas)):
+        event.listen(profiled.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(profiled.sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(profiled.sync_engine, "handle_error", _handle_error)
+    app.add_middleware(SQLProfilerMiddleware)
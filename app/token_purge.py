@@ -0,0 +1,64 @@
+"""
+Batch deletion of refresh tokens that can no longer be used
+
+Runs in the API process every REFRESH_TOKEN_PURGE_INTERVAL_SECONDS (0 turns
+it off), or once from cron or a scheduled job:
+
+    python -m app.token_purge
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, or_, select
+
+from . import models
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+# Rows deleted per statement, so the purge never holds long locks
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", "1000"))
+
+async def purge_refresh_tokens(batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+    """Delete expired and invalidated tokens, one committed batch at a time"""
+    purgeable = select(models.RefreshToken.id).where(
+        or_(
+            models.RefreshToken.expires_at <= datetime.utcnow(),
+            models.RefreshToken.is_active == False
+        )
+    ).limit(batch_size)
+
+    deleted = 0
+    async with SessionLocal() as db:
+        while True:
+            result = await db.execute(
+                delete(models.RefreshToken).where(models.RefreshToken.id.in_(purgeable.scalar_subquery()))
+            )
+            await db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
+async def run():
+    """Purge now and then every REFRESH_TOKEN_PURGE_INTERVAL_SECONDS until cancelled"""
+    while True:
+        try:
+            deleted = await purge_refresh_tokens()
+            if deleted:
+                logger.info("Purged %d refresh tokens", deleted)
+        except Exception:
+            logger.exception("Failed to purge refresh tokens")
+        await asyncio.sleep(REFRESH_TOKEN_PURGE_INTERVAL_SECONDS)
+
+async def _main():
+    started = time.perf_counter()
+    deleted = await purge_refresh_tokens()
+    await engine.dispose()
+    print(f"Purged {deleted} refresh tokens in {time.perf_counter() - started:.2f}s")
+
+if __name__ == "__main__":
+    asyncio.run(_main())
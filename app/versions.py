@@ -0,0 +1,139 @@
+"""
+Version counters backing ETag / Last-Modified revalidation
+
+Products and warehouses keep one counter per table. Inventory changes too
+often for that: each row carries its own version instead, so a stock change
+neither contends on a shared row nor invalidates every other item's tag.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .replicas import get_read_db
+
+_UPSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+async def bump_versions(db: AsyncSession, *tables: str):
+    """Advance the version of each table in the current transaction; the caller commits
+
+    Bump in the same transaction as the data change, so the two commit or
+    fail together: a write never succeeds without changing the tag.
+    """
+    now = datetime.now(timezone.utc)
+    upsert = _UPSERTS[db.bind.dialect.name]
+    for table in tables:
+        statement = upsert(models.TableVersion).values(name=table, version=1, updated_at=now)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=[models.TableVersion.name],
+            set_={"version": models.TableVersion.version + 1, "updated_at": now},
+        ))
+
+async def get_versions(db: AsyncSession, tables: tuple) -> list[tuple]:
+    rows = await db.execute(
+        select(models.TableVersion.name, models.TableVersion.version, models.TableVersion.updated_at)
+        .where(models.TableVersion.name.in_(tables))
+    )
+    versions = {name: (version, updated_at) for name, version, updated_at in rows}
+    # Tables never written through crud are at version 0
+    return [(table, *versions.get(table, (0, None))) for table in tables]
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes; they were stored as UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def _tag(state: str) -> str:
+    return '"' + hashlib.sha1(state.encode()).hexdigest()[:20] + '"'
+
+def _etag(versions: list[tuple]) -> str:
+    # The timestamps keep tags from repeating if the database is recreated
+    return _tag(";".join(
+        f"{table}:{version}:{updated_at.isoformat() if updated_at else ''}"
+        for table, version, updated_at in versions
+    ))
+
+def row_etag(table: str, row_id: int, version: int, *values) -> str:
+    """Tag of one row at its version; its values keep tags from repeating if the database is recreated"""
+    return _tag(":".join(str(part) for part in (table, row_id, version, *values)))
+
+def page_etag(table: str, rows: list) -> str:
+    """Tag of a page of rows, each a tuple holding its id and version
+
+    Changes when any row on the page changes, or rows join or leave it.
+    """
+    return _tag(table + ";" + ";".join(":".join(str(value) for value in row) for row in rows))
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # HTTP dates have whole-second precision
+    return last_modified.replace(microsecond=0) <= since
+
+def check_row_etag(request: Request, response: Response, etag: str):
+    """Answer 304 when If-None-Match carries the current tag, otherwise set ETag
+
+    For rows with their own version: they are already loaded, so a match
+    saves serializing and sending them.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+def conditional_get(*tables: str) -> Callable:
+    """Dependency answering 304 when none of the tables changed since the client's copy
+
+    The check costs one primary-key lookup, so a revalidation skips loading and
+    serializing the rows. On a full response it sets ETag and Last-Modified.
+    Endpoints must read through `get_read_db` too: the session is shared, so
+    the tag always describes the database (primary or replica) the rows came from.
+    Declare it after the auth dependency so unauthenticated callers get 401.
+    """
+    async def check_versions(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db)
+    ):
+        versions = await get_versions(db, tables)
+        headers = {"ETag": _etag(versions), "Cache-Control": "private, no-cache"}
+        timestamps = [_as_utc(updated_at) for _, _, updated_at in versions if updated_at is not None]
+        last_modified: Optional[datetime] = max(timestamps) if len(timestamps) == len(tables) else None
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(last_modified.replace(microsecond=0), usegmt=True)
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # If-Modified-Since is ignored whenever If-None-Match is present
+            not_modified = _etag_matches(if_none_match, headers["ETag"])
+        else:
+            if_modified_since = request.headers.get("if-modified-since")
+            not_modified = (
+                if_modified_since is not None
+                and last_modified is not None
+                and _not_modified_since(if_modified_since, last_modified)
+            )
+        if not_modified:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+
+    return check_versions
@@ -0,0 +1,67 @@
+"""
+Bounded thread pool for CPU-heavy work that must not run on the event loop
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+class PoolSaturated(Exception):
+    """Raised when a pool's queue is full and new work is rejected"""
+
+    def __init__(self, pool_name: str):
+        super().__init__(f"Worker pool '{pool_name}' is saturated")
+        self.pool_name = pool_name
+
+class BoundedWorkerPool:
+    """Thread pool that rejects work once `max_queue` jobs are waiting for a worker"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Run fn(*args) on a worker thread, raising PoolSaturated if the queue is full"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturated(self.name)
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, fn, args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def _call(self, fn: Callable[..., Any], args: tuple) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def stats(self) -> dict:
+        """Snapshot of pool size, queue depth and throughput counters"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": max(self._pending - self._running, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,333 @@
+"""
+Endpoint load test: throughput and p50/p95/p99 latency per route
+
+Boots `app.main:app` in-process over httpx's ASGI transport against a fresh
+database, or targets a running server (e.g. uvicorn with several workers)
+with --url. Each route is driven in turn by --concurrency clients, so the
+numbers of one route are not skewed by another's load.
+
+    python -m benchmarks.endpoints --requests 200 --concurrency 10 --output run.json
+    python -m benchmarks.endpoints --url http://localhost:8000 --compare run.json
+
+Results are saved as JSON with --output; --compare reports routes whose p95
+grew by more than --threshold percent against a saved run and exits with
+status 1 if there are any. The event streams (/inventory/events,
+/inventory/ws) and /auth/logout are not driven.
+
+Without DATABASE_URL a throwaway SQLite file is used. In-process runs drop and
+recreate the tables of the target database.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_endpoints.db")
+
+import httpx  # noqa: E402
+
+ADMIN = {"email": "admin@company.se", "password": "SecureAdmin123"}
+BENCH_PASSWORD = "BenchPassword123"
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+class Context:
+    """State shared by the route scenarios of one run"""
+
+    def __init__(self, run_id: str, concurrency: int):
+        self.run_id = run_id
+        self.concurrency = concurrency
+        self.counter = itertools.count()
+        self.admin_headers: dict = {}
+        self.bench_user_id = None
+        # One refresh token chain per client; refresh rotates the token and
+        # logging in again ends the user's other sessions, so clients never share users
+        self.refresh_tokens: list = []
+        self.bench_users: list = []
+
+    def unique(self) -> int:
+        return next(self.counter)
+
+async def login(client: httpx.AsyncClient, credentials: dict) -> dict:
+    response = await client.post("/auth/login", json=credentials)
+    response.raise_for_status()
+    return response.json()
+
+async def setup(client: httpx.AsyncClient, ctx: Context):
+    tokens = await login(client, ADMIN)
+    ctx.admin_headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    for client_id in range(ctx.concurrency):
+        email = f"bench-{ctx.run_id}-{client_id}@example.com"
+        response = await client.post(
+            "/auth/register", json={"email": email, "password": BENCH_PASSWORD, "role": "viewer"}
+        )
+        response.raise_for_status()
+        ctx.bench_user_id = response.json()["id"]
+        ctx.bench_users.append({"email": email, "password": BENCH_PASSWORD})
+        tokens = await login(client, ctx.bench_users[-1])
+        ctx.refresh_tokens.append(tokens["refresh_token"])
+
+# Route scenarios: name -> coroutine issuing one request as client `client_id`
+async def get_root(client, ctx, client_id):
+    return await client.get("/")
+
+async def get_health(client, ctx, client_id):
+    return await client.get("/health")
+
+async def post_register(client, ctx, client_id):
+    email = f"bench-{ctx.run_id}-register-{ctx.unique()}@example.com"
+    return await client.post("/auth/register", json={"email": email, "password": BENCH_PASSWORD})
+
+async def post_login(client, ctx, client_id):
+    return await client.post("/auth/login", json=ADMIN)
+
+async def post_refresh(client, ctx, client_id):
+    response = await client.post("/auth/refresh", json={"refresh_token": ctx.refresh_tokens[client_id]})
+    ctx.refresh_tokens[client_id] = response.json()["refresh_token"] if response.status_code == 200 else None
+    return response
+
+async def restore_refresh_chain(client, ctx, client_id):
+    # A failed refresh may have ended the session; log in again, outside the timing
+    for attempt in range(5):
+        if ctx.refresh_tokens[client_id] is not None:
+            return
+        try:
+            tokens = await login(client, ctx.bench_users[client_id])
+            ctx.refresh_tokens[client_id] = tokens["refresh_token"]
+        except httpx.HTTPStatusError as exc:
+            # Shed by admission control while the auth class is saturated
+            await asyncio.sleep(float(exc.response.headers.get("retry-after", "0.5")))
+    raise RuntimeError(f"Could not log bench client {client_id} in again")
+
+# Untimed set-up run before each request of a scenario
+post_refresh.prepare = restore_refresh_chain
+
+def get(path: str):
+    async def scenario(client, ctx, client_id):
+        return await client.get(path, headers=ctx.admin_headers)
+    return scenario
+
+async def post_product(client, ctx, client_id):
+    return await client.post("/products/", headers=ctx.admin_headers, json={
+        "name": f"Bench product {ctx.unique()}", "price": 199.0, "category": "Bench", "brand": "Bench"
+    })
+
+async def post_product_import(client, ctx, client_id):
+    body = "\n".join(
+        json.dumps({"name": f"Imported {ctx.unique()}", "price": 49.0, "category": "Bench"})
+        for _ in range(10)
+    )
+    return await client.post(
+        "/products/import", headers={**ctx.admin_headers, "Content-Type": "application/x-ndjson"}, content=body
+    )
+
+async def post_warehouse(client, ctx, client_id):
+    return await client.post("/warehouses/", headers=ctx.admin_headers, json={
+        "name": f"Bench warehouse {ctx.unique()}", "city": "Uppsala"
+    })
+
+async def post_inventory(client, ctx, client_id):
+    return await client.post("/inventory/", headers=ctx.admin_headers, json={
+        "product_id": 1, "warehouse_id": 1, "quantity": 5
+    })
+
+async def put_inventory_item(client, ctx, client_id):
+    return await client.put("/inventory/1/2", headers=ctx.admin_headers, json={"quantity": ctx.unique() % 100})
+
+async def post_inventory_adjust(client, ctx, client_id):
+    return await client.post("/inventory/1/1/adjust", headers=ctx.admin_headers, json={"delta": 1})
+
+async def put_inventory_bulk(client, ctx, client_id):
+    quantity = ctx.unique() % 100
+    return await client.put("/inventory/bulk", headers=ctx.admin_headers, json={"items": [
+        {"product_id": product_id, "warehouse_id": warehouse_id, "quantity": quantity}
+        for product_id in range(1, 11) for warehouse_id in range(1, 4)
+    ]})
+
+async def put_user(client, ctx, client_id):
+    return await client.put(f"/users/{ctx.bench_user_id}", headers=ctx.admin_headers, json={"is_active": True})
+
+# (name, scenario, is_auth): bcrypt-bound auth routes run --auth-requests times
+SCENARIOS = [
+    ("GET /", get_root, False),
+    ("GET /health", get_health, False),
+    ("POST /auth/register", post_register, True),
+    ("POST /auth/login", post_login, True),
+    ("POST /auth/refresh", post_refresh, False),
+    ("GET /products/", get("/products/"), False),
+    ("GET /products/?facets=true", get("/products/?facets=true&category=Electronics"), False),
+    ("GET /products/{id}", get("/products/1"), False),
+    ("GET /products/search", get("/products/search?q=kanken"), False),
+    ("GET /products/export", get("/products/export?format=ndjson"), False),
+    ("POST /products/", post_product, False),
+    ("POST /products/import", post_product_import, False),
+    ("GET /warehouses/", get("/warehouses/"), False),
+    ("POST /warehouses/", post_warehouse, False),
+    ("GET /inventory/", get("/inventory/"), False),
+    ("GET /inventory/low-stock", get("/inventory/low-stock"), False),
+    ("GET /inventory/{p}/{w}", get("/inventory/1/1"), False),
+    ("PUT /inventory/{p}/{w}", put_inventory_item, False),
+    ("POST /inventory/{p}/{w}/adjust", post_inventory_adjust, False),
+    ("PUT /inventory/bulk", put_inventory_bulk, False),
+    ("GET /inventory/export", get("/inventory/export?format=csv"), False),
+    ("GET /users/", get("/users/"), False),
+    ("GET /users/{id}", get("/users/1"), False),
+    ("PUT /users/{id}", put_user, False),
+    # Last, so the duplicate (product, warehouse) rows it adds don't affect other routes
+    ("POST /inventory/", post_inventory, False),
+]
+
+async def run_route(client: httpx.AsyncClient, ctx: Context, scenario, requests: int) -> dict:
+    remaining = iter(range(requests))
+    latencies = []
+    statuses = Counter()
+
+    async def worker(client_id: int):
+        prepare = getattr(scenario, "prepare", None)
+        for _ in remaining:
+            if prepare is not None:
+                await prepare(client, ctx, client_id)
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, ctx, client_id)
+                await response.aread()
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client_id) for client_id in range(ctx.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(statuses),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def print_results(routes: dict):
+    print(f"{'route':<34} {'req':>5} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, result in routes.items():
+        print(
+            f"{name:<34} {result['requests']:>5} {result['errors']:>4} {result['throughput_rps']:>8.1f} "
+            f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+        )
+
+def compare(routes: dict, baseline_path: str, threshold: float) -> list:
+    """Routes whose p95 grew more than `threshold` percent against a saved run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["routes"]
+    regressions = []
+    for name, result in routes.items():
+        before = baseline.get(name)
+        if before is None or before["p95_ms"] <= 0:
+            continue
+        change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        if change > threshold:
+            regressions.append((name, before["p95_ms"], result["p95_ms"], change))
+    return regressions
+
+async def run(args, client: httpx.AsyncClient) -> dict:
+    ctx = Context(datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S"), args.concurrency)
+    await setup(client, ctx)
+    routes = {}
+    for name, scenario, is_auth in SCENARIOS:
+        if args.routes and not any(part in name for part in args.routes):
+            continue
+        requests = args.auth_requests if is_auth else args.requests
+        routes[name] = await run_route(client, ctx, scenario, requests)
+        print(f"  {name}: {routes[name]['p50_ms']:.2f} ms p50", file=sys.stderr)
+    return routes
+
+async def run_in_process(args) -> tuple[dict, str]:
+    from app.database import Base, engine
+    from app.main import app
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    # Runs the app's startup: schema creation and seed data
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            routes = await run(args, client)
+    await engine.dispose()
+    return routes, engine.dialect.name
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="Target a running server instead of booting the app in-process")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--auth-requests", type=int, default=50, help="Requests for password-hashing routes")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--routes", nargs="*", help="Only run routes whose name contains one of these")
+    parser.add_argument("--output", help="Save results as JSON")
+    parser.add_argument("--compare", help="Saved JSON run to check for p95 regressions against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Allowed p95 growth in percent")
+    args = parser.parse_args()
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            routes = await run(args, client)
+        database = "remote"
+    else:
+        routes, database = await run_in_process(args)
+
+    print_results(routes)
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "target": args.url or "asgi",
+            "database": database,
+            "requests": args.requests,
+            "auth_requests": args.auth_requests,
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+        },
+        "routes": routes,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
+
+    if args.compare:
+        regressions = compare(routes, args.compare, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: p95 {before:.2f} ms -> {after:.2f} ms (+{change:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No p95 regressions above {args.threshold:.0f}% against {args.compare}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
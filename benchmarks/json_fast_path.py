@@ -0,0 +1,88 @@
+"""
+Serialization benchmark for inventory list responses
+
+Compares the ORM path (ORM instances validated into `schemas.Inventory` and
+rendered as FastAPI would) with the Core + orjson fast path used by
+`GET /inventory/`, checks both produce identical bytes, and reports timings
+per page size.
+
+    python -m benchmarks.json_fast_path --rows 100 1000 10000 --repeat 20
+
+Without DATABASE_URL a throwaway SQLite file is used. The target database's
+tables are dropped and recreated.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_json_fast_path.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.fast_json import encode_rows, schema_columns  # noqa: E402
+from app.response_cache import render_json  # noqa: E402
+
+COLUMNS = schema_columns(models.Inventory, schemas.Inventory)
+
+async def reset_database(rows: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    warehouses = 10
+    async with SessionLocal() as db:
+        await db.execute(insert(models.Warehouse), [
+            {"name": f"Warehouse {i}", "city": "Stockholm"} for i in range(warehouses)
+        ])
+        await db.execute(insert(models.Product), [
+            {"name": f"Product {i}", "price": 9.5, "category": "Bench", "search_text": ""}
+            for i in range(rows // warehouses + 1)
+        ])
+        await db.execute(insert(models.Inventory), [
+            {
+                "product_id": i // warehouses + 1,
+                "warehouse_id": i % warehouses + 1,
+                "quantity": i % 97,
+                "minimum_stock_level": 10,
+            }
+            for i in range(rows)
+        ])
+        await db.commit()
+
+async def orm_path(limit: int) -> bytes:
+    async with SessionLocal() as db:
+        items = await crud.get_inventory_items(db, limit=limit)
+        return render_json(list[schemas.Inventory], items)
+
+async def fast_path(limit: int) -> bytes:
+    async with SessionLocal() as db:
+        rows = await crud.get_inventory_items(db, limit=limit, columns=COLUMNS)
+        return encode_rows(COLUMNS, rows)
+
+async def best_of(fn, limit: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn(limit)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    await reset_database(max(args.rows))
+    print(f"{'rows':>8} {'orm ms':>10} {'fast ms':>10} {'speedup':>8}  identical")
+    for limit in args.rows:
+        identical = await orm_path(limit) == await fast_path(limit)
+        orm = await best_of(orm_path, limit, args.repeat)
+        fast = await best_of(fast_path, limit, args.repeat)
+        print(f"{limit:>8} {orm * 1000:>10.2f} {fast * 1000:>10.2f} {orm / fast:>7.1f}x  {identical}")
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""
+Shared fixtures: a throwaway SQLite database behind the application's engine
+"""
+import asyncio
+import os
+import tempfile
+
+# The engine is created when app.database is imported, so point it at a scratch
+# file first; tests drop and recreate every table
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+
+import pytest
+
+from app import models  # noqa: F401  registers the tables on Base.metadata
+from app.database import Base, SessionLocal, engine
+
+@pytest.fixture
+def run_db():
+    """Run `fn(db)` against freshly created tables and return its result"""
+    async def run(fn):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with SessionLocal() as db:
+                return await fn(db)
+        finally:
+            # Each test runs its own event loop; pooled connections can't outlive it
+            await engine.dispose()
+
+    return lambda fn: asyncio.run(run(fn))
@@ -0,0 +1,84 @@
+"""
+Adaptive admission limits: overload backs a class off, normal load restores it
+"""
+from app.admission import AdaptiveLimit
+
+FAST = 0.0001   # GET /
+LIST = 0.02     # GET /products/?limit=50
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def run(limit: AdaptiveLimit, clock: Clock, concurrency: int, latencies: dict, rounds: int):
+    """Complete `rounds` waves of requests, `concurrency` at a time, over the given routes"""
+    rejected = 0
+    for _ in range(rounds):
+        admitted = []
+        for i in range(concurrency):
+            mark = limit.busy_admissions
+            if limit.try_acquire():
+                admitted.append((i, mark))
+            else:
+                rejected += 1
+        routes = list(latencies.items())
+        for i, mark in admitted:
+            route, latency = routes[i % len(routes)]
+            clock.now += latency
+            limit.release(latency, route, mark)
+    return rejected
+
+def warm_up(limit, clock):
+    run(limit, clock, 10, {"/": FAST, "/products/": LIST}, 10)
+
+def test_mixed_routes_at_normal_latency_keep_the_limit():
+    clock = Clock()
+    limit = AdaptiveLimit("read", 200, clock=clock)
+    warm_up(limit, clock)
+
+    # Busy, but every route runs at its usual speed: no overload
+    rejected = run(limit, clock, 120, {"/": FAST, "/products/": LIST}, 50)
+
+    assert rejected == 0
+    assert limit.limit == 200
+
+def test_overload_backs_off_and_normal_load_recovers():
+    clock = Clock()
+    limit = AdaptiveLimit("read", 200, clock=clock)
+    warm_up(limit, clock)
+
+    # List queries slow to 10x their baseline while the class is busy
+    run(limit, clock, 150, {"/": FAST, "/products/": LIST * 10}, 60)
+    collapsed = limit.limit
+    assert collapsed < 100
+
+    # Back to usual latencies: the limit climbs until shedding stops, then back to its maximum
+    run(limit, clock, 20, {"/": FAST, "/products/": LIST}, 30)
+    assert run(limit, clock, 20, {"/": FAST, "/products/": LIST}, 30) == 0
+    assert limit.limit == 200
+
+def test_latency_of_requests_admitted_under_load_stays_out_of_the_baseline():
+    clock = Clock()
+    limit = AdaptiveLimit("read", 200, clock=clock)
+    warm_up(limit, clock)
+    baseline = limit.routes["/products/"].baseline
+
+    # A burst that completes slowly, the last requests after the load has drained
+    mark = limit.busy_admissions
+    admitted = [limit.try_acquire() for _ in range(150)]
+    for _ in admitted:
+        limit.release(LIST * 100, "/products/", mark)
+
+    assert limit.routes["/products/"].baseline == baseline
+
+def test_slow_requests_on_an_idle_class_are_not_overload():
+    clock = Clock()
+    limit = AdaptiveLimit("write", 64, clock=clock)
+    warm_up(limit, clock)
+
+    run(limit, clock, 1, {"/products/": LIST * 50}, 50)
+
+    assert limit.limit == 64
@@ -0,0 +1,54 @@
+"""
+Bulk inventory updates: per-item statuses, duplicate keys and the request size limit
+"""
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import select
+
+from app import crud, models, schemas
+
+def item(product_id: int, warehouse_id: int, quantity: int) -> schemas.InventoryQuantity:
+    return schemas.InventoryQuantity(product_id=product_id, warehouse_id=warehouse_id, quantity=quantity)
+
+async def seed(db):
+    db.add(models.Product(name="Kånken", price=895, category="Fashion"))
+    db.add_all([models.Warehouse(name=f"Warehouse {i}", city="Kiruna") for i in range(1, 4)])
+    await db.flush()
+    db.add_all([
+        models.Inventory(product_id=1, warehouse_id=warehouse_id, quantity=10)
+        for warehouse_id in range(1, 4)
+    ])
+    await db.commit()
+
+async def stock(db) -> dict:
+    rows = await db.execute(select(models.Inventory.warehouse_id, models.Inventory.quantity, models.Inventory.version))
+    return {warehouse_id: (quantity, version) for warehouse_id, quantity, version in rows}
+
+@pytest.mark.parametrize("chunk_size", [5000, 1])
+def test_statuses_and_duplicates(run_db, monkeypatch, chunk_size):
+    monkeypatch.setattr(crud, "BULK_UPDATE_CHUNK_SIZE", chunk_size)
+
+    async def check(db):
+        await seed(db)
+        result = await crud.bulk_update_inventory_quantities(db, [
+            item(1, 1, 5),
+            item(1, 2, 10),
+            item(1, 3, 7),
+            item(1, 9, 1),
+            item(1, 3, 10),  # a later duplicate wins: back to the current quantity
+            item(1, 1, 20),
+        ])
+        assert (result.updated, result.unchanged, result.not_found) == (1, 2, 1)
+        # One result per item, each reporting the outcome for its key
+        assert [(r.warehouse_id, r.status) for r in result.results] == [
+            (1, "updated"), (2, "unchanged"), (3, "unchanged"), (9, "not_found"), (3, "unchanged"), (1, "updated"),
+        ]
+        # Only changed rows take a new version
+        assert await stock(db) == {1: (20, 2), 2: (10, 1), 3: (10, 1)}
+
+    run_db(check)
+
+def test_request_size_is_limited():
+    schemas.InventoryBulkUpdate(items=[item(1, 1, 0)] * 50000)
+    with pytest.raises(ValidationError):
+        schemas.InventoryBulkUpdate(items=[item(1, 1, 0)] * 50001)
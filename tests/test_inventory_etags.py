@@ -0,0 +1,57 @@
+"""
+Inventory ETags: item and page tags follow per-row versions
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+from app.dependencies import require_admin_or_manager, require_any_role
+from app.main import app
+
+MANAGER = models.User(id=1, email="manager@example.com", role=models.UserRole.manager, is_active=True)
+
+@pytest.fixture
+def client(run_db):
+    async def seed(db):
+        db.add(models.Product(name="Kånken", price=895, category="Fashion"))
+        db.add_all([models.Warehouse(name=f"Warehouse {i}", city="Kiruna") for i in range(1, 5)])
+        await db.flush()
+        # Row n is in warehouse n; rows 1 and 2 start below their minimum stock level of 10
+        db.add_all([
+            models.Inventory(product_id=1, warehouse_id=warehouse_id, quantity=quantity)
+            for warehouse_id, quantity in enumerate((1, 2, 30, 40), start=1)
+        ])
+        await db.commit()
+
+    run_db(seed)
+    app.dependency_overrides[require_any_role] = lambda: MANAGER
+    app.dependency_overrides[require_admin_or_manager] = lambda: MANAGER
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def revalidate(client, url: str, etag: str) -> int:
+    return client.get(url, headers={"If-None-Match": etag}).status_code
+
+def adjust(client, warehouse_id: int, delta: int):
+    assert client.post(f"/inventory/1/{warehouse_id}/adjust", json={"delta": delta}).status_code == 200
+
+def test_page_is_not_modified_until_one_of_its_rows_changes(client):
+    first_page = client.get("/inventory/?limit=2")
+    assert first_page.status_code == 200
+    etag = first_page.headers["etag"]
+    assert revalidate(client, "/inventory/?limit=2", etag) == 304
+
+    adjust(client, 3, 5)
+    assert revalidate(client, "/inventory/?limit=2", etag) == 304
+
+    adjust(client, 2, 5)
+    assert revalidate(client, "/inventory/?limit=2", etag) == 200
+
+def test_low_stock_tag_changes_when_rows_join_the_page(client):
+    etag = client.get("/inventory/low-stock").headers["etag"]
+    assert revalidate(client, "/inventory/low-stock", etag) == 304
+
+    adjust(client, 3, -25)
+    response = client.get("/inventory/low-stock", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == [1, 2, 3]
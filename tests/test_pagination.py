@@ -0,0 +1,93 @@
+"""
+Keyset pagination: cursor encoding, multi-column keysets and the next-page header
+"""
+import base64
+
+import pytest
+from fastapi import HTTPException, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import models
+from app.dependencies import require_any_role
+from app.main import app
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, paginate_after, set_next_cursor
+
+MANAGER = models.User(id=1, email="manager@example.com", role=models.UserRole.manager, is_active=True)
+
+async def seed(db):
+    db.add_all([models.Product(name=f"Product {i}", price=10, category="Outdoor") for i in range(1, 4)])
+    db.add_all([models.Warehouse(name=f"Warehouse {i}", city="Kiruna") for i in range(1, 3)])
+    await db.flush()
+    # Inserted out of key order, so ids and (product, warehouse) order disagree
+    db.add_all([
+        models.Inventory(product_id=product_id, warehouse_id=warehouse_id, quantity=5)
+        for warehouse_id in (2, 1) for product_id in (3, 1, 2)
+    ])
+    await db.commit()
+
+@pytest.mark.parametrize("values", [[42], [3, 17], ["Kiruna", 7]])
+def test_cursor_round_trips(values):
+    cursor = encode_cursor(values)
+    assert "=" not in cursor
+    assert decode_cursor(cursor, [type(value) for value in values]) == values
+
+@pytest.mark.parametrize("cursor, types", [
+    ("not base64!", (int,)),
+    (base64.urlsafe_b64encode(b"{not json").decode(), (int,)),
+    (encode_cursor([1, 2]), (int,)),
+    (encode_cursor(["1"]), (int,)),
+    (encode_cursor([True]), (int,)),
+    (base64.urlsafe_b64encode(b'{"id": 1}').decode(), (int,)),
+    (encode_cursor([1]), (str,)),
+])
+def test_malformed_or_mistyped_cursors_are_rejected(cursor, types):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, types)
+    assert exc_info.value.status_code == 400
+
+def test_multi_column_keyset_walks_every_row_once(run_db):
+    columns = [models.Inventory.product_id, models.Inventory.warehouse_id]
+
+    async def check(db):
+        await seed(db)
+        seen = []
+        after = None
+        while True:
+            page = (await db.execute(paginate_after(select(*columns), columns, after).limit(4))).all()
+            seen.extend(tuple(row) for row in page)
+            if len(page) < 4:
+                return seen
+            after = decode_cursor(encode_cursor(page[-1]), (int, int))
+
+    assert run_db(check) == [(p, w) for p in (1, 2, 3) for w in (1, 2)]
+
+def test_next_cursor_only_on_full_pages():
+    items = [models.Inventory(id=1), models.Inventory(id=2)]
+    full, partial, empty = Response(), Response(), Response()
+    set_next_cursor(full, items, limit=2)
+    set_next_cursor(partial, items, limit=3)
+    set_next_cursor(empty, [], limit=0)
+    assert decode_cursor(full.headers[NEXT_CURSOR_HEADER]) == [2]
+    assert NEXT_CURSOR_HEADER not in partial.headers
+    assert NEXT_CURSOR_HEADER not in empty.headers
+
+@pytest.fixture
+def client(run_db):
+    run_db(seed)
+    app.dependency_overrides[require_any_role] = lambda: MANAGER
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def test_endpoint_pages_by_cursor_until_the_last_page(client):
+    ids = []
+    params = {"limit": 4}
+    while True:
+        response = client.get("/inventory/", params=params)
+        assert response.status_code == 200
+        ids.extend(row["id"] for row in response.json())
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["after"] = response.headers[NEXT_CURSOR_HEADER]
+    assert ids == [1, 2, 3, 4, 5, 6]
+    assert client.get("/inventory/", params={"after": "garbage"}).status_code == 400
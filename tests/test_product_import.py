@@ -0,0 +1,91 @@
+"""
+Product import: CSV/NDJSON parsing, per-row validation and batch fallback
+"""
+from sqlalchemy import select, text
+
+from app import models, product_import
+
+async def chunks(body: bytes, size: int = 7):
+    # Small chunks split lines, quoted fields and CRLF pairs across reads
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+def run_import(run_db, body: bytes, fmt: str = "csv", setup=None):
+    async def check(db):
+        if setup is not None:
+            await setup(db)
+        result = await product_import.import_products(db, chunks(body), fmt)
+        names = (await db.scalars(select(models.Product.name).order_by(models.Product.id))).all()
+        return result, names
+
+    return run_db(check)
+
+def error_lines(result) -> dict:
+    return {error.line: error.error for error in result.errors}
+
+def test_quoted_field_spanning_lines(run_db):
+    body = b'name,description,price,category\nKettle,"Boils water\nquickly, quietly",20,Kitchen\nMug,,4,Kitchen\n'
+    result, names = run_import(run_db, body)
+    assert (result.processed, result.imported, result.failed) == (2, 2, 0)
+    assert names == ["Kettle", "Mug"]
+
+def test_crlf_input(run_db):
+    body = b'name,price,category\r\nKettle,20,Kitchen\r\n"Two\r\nline mug",4,Kitchen\r\n'
+    result, names = run_import(run_db, body)
+    assert result.imported == 2
+    assert names == ["Kettle", "Two\nline mug"]
+
+def test_invalid_rows_are_reported_by_line(run_db):
+    brand_limit = product_import.STRING_LIMITS["brand"]
+    body = (
+        b'name,price,category,brand\n'
+        b'Kettle,20,Kitchen,\n'
+        b'Mug,cheap,Kitchen,\n'
+        b'Pan,"multi\nline",Kitchen,\n'
+        b'Lamp,NaN,Lighting,\n'
+        b'Desk,90,Office,' + b"x" * (brand_limit + 1) + b'\n'
+        b'Chair,30\n'
+    )
+    result, names = run_import(run_db, body)
+    assert (result.processed, result.imported, result.failed) == (6, 1, 5)
+    assert names == ["Kettle"]
+    errors = error_lines(result)
+    assert sorted(errors) == [3, 4, 6, 7, 8]
+    assert errors[3].startswith("price:")
+    assert errors[4].startswith("price:")
+    assert errors[6] == "price: Input should be a finite number"
+    assert errors[7] == f"brand: String should have at most {brand_limit} characters"
+    assert errors[8] == "Expected 4 fields, got 2"
+
+def test_ndjson_errors_are_reported_by_line(run_db):
+    body = (
+        b'{"name": "Kettle", "price": 20, "category": "Kitchen"}\n'
+        b'\n'
+        b'{"name": "Mug", "price": NaN, "category": "Kitchen"}\n'
+        b'[1, 2]\n'
+        b'{"name": "Lamp", "price": "1e999", "category": "Lighting"}\n'
+    )
+    result, names = run_import(run_db, body, "ndjson")
+    assert names == ["Kettle"]
+    errors = error_lines(result)
+    assert sorted(errors) == [3, 4, 5]
+    assert errors[3].startswith("Invalid JSON")
+    assert errors[4] == "Expected a JSON object"
+    assert errors[5] == "price: Input should be a finite number"
+
+def test_rejected_batch_falls_back_to_row_by_row(run_db, monkeypatch):
+    monkeypatch.setattr(product_import, "IMPORT_BATCH_SIZE", 3)
+
+    async def reject_boom(db):
+        await db.execute(text(
+            "CREATE TRIGGER reject_boom BEFORE INSERT ON products WHEN NEW.name = 'BOOM' "
+            "BEGIN SELECT RAISE(ABORT, 'boom row'); END"
+        ))
+        await db.commit()
+
+    body = b'name,price,category\nA,1,X\nBOOM,2,X\nB,3,X\nC,4,X\nD,5,X\n'
+    result, names = run_import(run_db, body, setup=reject_boom)
+    # The first batch is retried row by row; the second goes in whole
+    assert (result.processed, result.imported, result.failed) == (5, 4, 1)
+    assert names == ["A", "B", "C", "D"]
+    assert error_lines(result) == {3: "Rejected by the database: boom row"}
@@ -0,0 +1,51 @@
+"""
+Read-your-writes pinning: the caller of a committed write reads from the primary
+"""
+import asyncio
+import time
+
+from starlette.requests import Request
+
+from app import models, replicas
+from app.auth_utils import create_tokens_for_user
+
+def bearer(user_id: int) -> bytes:
+    user = models.User(id=user_id, email=f"user{user_id}@example.com", role=models.UserRole.manager)
+    return f"Bearer {create_tokens_for_user(user)['access_token']}".encode()
+
+def request(*headers: tuple) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers)})
+
+async def committing_app(scope, receive, send):
+    # What PrimarySession's after_commit hook does when a request commits
+    replicas._request_wrote.get()[0] = True
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+def write(*headers: tuple) -> dict:
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "PUT", "path": "/", "headers": list(headers)}
+    asyncio.run(replicas.ReplicaPinMiddleware(committing_app)(scope, None, send))
+    return dict(sent[0]["headers"])
+
+def test_writer_is_pinned_by_bearer_token_without_cookies():
+    write((b"authorization", bearer(41)))
+
+    assert replicas._pinned(request((b"authorization", bearer(41))))
+    assert not replicas._pinned(request((b"authorization", bearer(42))))
+
+def test_response_carries_the_pin_as_header_and_cookie():
+    headers = write()
+
+    until = float(headers[replicas.PIN_HEADER.lower().encode()])
+    assert until > time.time()
+    assert headers[b"set-cookie"].startswith(f"{replicas.PIN_COOKIE}=".encode())
+
+def test_echoed_pin_header_is_honored_until_it_expires():
+    assert replicas._pinned(request((b"x-db-pin", str(time.time() + 5).encode())))
+    assert not replicas._pinned(request((b"x-db-pin", str(time.time() - 1).encode())))
+    assert not replicas._pinned(request((b"x-db-pin", b"junk")))
@@ -0,0 +1,35 @@
+"""
+Response cache invalidation: runs once the write commits and never fails it
+"""
+from sqlalchemy import func, select
+
+from app import crud, models, schemas
+from app.response_cache import MemoryBackend, ResponseCache
+
+PRODUCT = schemas.ProductCreate(name="Kettle", price=20, category="Kitchen")
+
+class BrokenBackend(MemoryBackend):
+    async def invalidate(self, tags):
+        raise ConnectionError("cache unreachable")
+
+def test_product_write_invalidates_cached_responses(run_db, monkeypatch):
+    cache = ResponseCache(MemoryBackend(10, 1024, 60))
+    monkeypatch.setattr(crud, "response_cache", cache)
+
+    async def check(db):
+        await cache.backend.set("/products/?#old", b"[]", {}, ("products",))
+        await crud.create_product(db, PRODUCT)
+        assert await cache.backend.get("/products/?#old") is None
+        assert cache.invalidated == 1
+
+    run_db(check)
+
+def test_invalidation_failure_keeps_the_committed_write(run_db, monkeypatch):
+    monkeypatch.setattr(crud, "response_cache", ResponseCache(BrokenBackend(10, 1024, 60)))
+
+    async def check(db):
+        product = await crud.create_product(db, PRODUCT)
+        assert product.id is not None
+        assert await db.scalar(select(func.count()).select_from(models.Product)) == 1
+
+    run_db(check)
@@ -0,0 +1,23 @@
+"""
+Claims-mode revocation: tokens issued before a user's change go to the database
+"""
+from datetime import datetime
+
+from app.revocation import RevocationSet
+
+CHANGED_AT = datetime(2026, 1, 1, 12, 0, 0)
+CHANGED_EPOCH = 1767268800
+
+def test_tokens_issued_before_a_change_are_revoked_even_after_a_new_login():
+    revocations = RevocationSet(30, 30)
+    revocations.add(7, CHANGED_AT)
+
+    assert revocations.revoked(7, CHANGED_EPOCH - 60)
+    assert not revocations.revoked(7, CHANGED_EPOCH + 60)
+
+def test_tokens_without_iat_are_revoked_for_changed_users_only():
+    revocations = RevocationSet(30, 30)
+    revocations.add(7, CHANGED_AT)
+
+    assert revocations.revoked(7, None)
+    assert not revocations.revoked(8, None)
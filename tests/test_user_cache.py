@@ -0,0 +1,44 @@
+"""
+Cached principals: a change made by another worker is honored once the revocation set refreshes
+"""
+from datetime import datetime
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import update
+
+from app import cache, dependencies, models
+from app.auth_utils import create_tokens_for_user
+from app.revocation import RevocationSet
+
+def test_user_cache_is_off_by_default():
+    assert cache.USER_CACHE_SIZE == 0
+
+def test_demotion_by_another_worker_reaches_the_cache_on_refresh(run_db, monkeypatch):
+    revocations = RevocationSet(30, 30)
+    monkeypatch.setattr(dependencies, "user_cache", cache.TTLCache(maxsize=100, ttl=60))
+    monkeypatch.setattr(dependencies, "revocation_set", revocations)
+
+    async def check(db):
+        user = models.User(email="manager@example.com", hashed_password="x", role=models.UserRole.manager)
+        db.add(user)
+        await db.commit()
+        credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=create_tokens_for_user(user)["access_token"]
+        )
+        await revocations.refresh(db)
+        assert (await dependencies.get_current_user(credentials, db)).role == models.UserRole.manager
+
+        # Another worker demotes the user: this process's cache isn't evicted
+        await db.execute(
+            update(models.User)
+            .where(models.User.id == user.id)
+            .values(role=models.UserRole.viewer, tokens_valid_after=datetime.utcnow())
+        )
+        await db.commit()
+        assert (await dependencies.get_current_user(credentials, db)).role == models.UserRole.manager
+
+        # The next periodic refresh picks the change up and the cached copy is dropped
+        await revocations.refresh(db)
+        assert (await dependencies.get_current_user(credentials, db)).role == models.UserRole.viewer
+
+    run_db(check)
@@ -0,0 +1,52 @@
+"""
+User updates: nulls and unchanged values leave the user and their sessions alone
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import crud, models, schemas
+
+async def add_manager(db) -> models.User:
+    user = models.User(email="manager@example.com", hashed_password="x", role=models.UserRole.manager)
+    db.add(user)
+    await db.flush()
+    db.add(models.RefreshToken(
+        token_hash="0" * 64, user_id=user.id, expires_at=datetime.utcnow() + timedelta(days=1)
+    ))
+    await db.commit()
+    return user
+
+async def session_active(db) -> bool:
+    return await db.scalar(select(models.RefreshToken.is_active))
+
+def test_explicit_nulls_are_ignored(run_db):
+    async def check(db):
+        user = await add_manager(db)
+        for update in ({"role": None}, {"is_active": None}):
+            updated = await crud.update_user(db, user.id, schemas.UserUpdate(**update))
+            assert updated.role == models.UserRole.manager
+            assert updated.is_active is True
+        assert updated.tokens_valid_after is None
+        assert await session_active(db)
+
+    run_db(check)
+
+def test_unchanged_role_keeps_tokens_valid(run_db):
+    async def check(db):
+        user = await add_manager(db)
+        updated = await crud.update_user(db, user.id, schemas.UserUpdate(role="manager"))
+        assert updated.tokens_valid_after is None
+        assert await session_active(db)
+
+    run_db(check)
+
+def test_role_change_ends_sessions(run_db):
+    async def check(db):
+        user = await add_manager(db)
+        updated = await crud.update_user(db, user.id, schemas.UserUpdate(role="viewer"))
+        assert updated.role == models.UserRole.viewer
+        assert updated.tokens_valid_after is not None
+        assert not await session_active(db)
+
+    run_db(check)
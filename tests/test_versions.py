@@ -0,0 +1,37 @@
+"""
+Table versions: the bump commits or fails together with the write it tags
+"""
+import pytest
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError
+
+from app import crud, models, schemas
+from app.versions import get_versions
+
+PRODUCT = schemas.ProductCreate(name="Kettle", price=20, category="Kitchen")
+
+async def count_products(db) -> int:
+    return await db.scalar(select(func.count()).select_from(models.Product))
+
+def test_writes_advance_their_table_version(run_db):
+    async def check(db):
+        await crud.create_product(db, PRODUCT)
+        await crud.bulk_insert_products(db, [PRODUCT.dict(), PRODUCT.dict()])
+        await crud.create_warehouse(db, schemas.WarehouseCreate(name="North", city="Leeds"))
+        versions = {table: version for table, version, _ in await get_versions(db, ("products", "warehouses"))}
+        assert versions == {"products": 2, "warehouses": 1}
+
+    run_db(check)
+
+def test_failed_bump_rolls_the_write_back(run_db):
+    async def check(db):
+        await db.execute(text("DROP TABLE table_versions"))
+        await db.commit()
+        with pytest.raises(DBAPIError):
+            await crud.create_product(db, PRODUCT)
+        await db.rollback()
+        with pytest.raises(DBAPIError):
+            await crud.bulk_insert_products(db, [PRODUCT.dict()])
+        assert await count_products(db) == 0
+
+    run_db(check)